@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Compares the throughput of rendering generated configs from scratch with
+# rendering them from a compiled sweep template.
+
+import argparse
+import itertools
+import time
+
+from hyperion import e2e
+from hyperion import rendering
+from hyperion import sweeps
+
+
+def make_sweep(n_axes, n_values, n_fixed):
+    lines = ["include 'base.gin'"]
+    lines += [
+        f"model.fixed_{i} = @compute(base={i}, scale=%scale_{i} * 2)"
+        for i in range(n_fixed)
+    ]
+    lines += [f"scale_{i} = {i + 1}" for i in range(n_fixed)]
+    lines += [
+        f"model.axis_{i}: [" + ", ".join(f"{j} * 0.5" for j in range(n_values)) + "]"
+        for i in range(n_axes)
+    ]
+    return "\n".join(lines)
+
+
+def measure(configs, limit):
+    start = time.perf_counter()
+    rendered = list(itertools.islice(configs, limit))
+    return (rendered, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare rendering configs from scratch with rendering them "
+        "from a compiled sweep template."
+    )
+    parser.add_argument("--axes", type=int, default=4)
+    parser.add_argument("--values", type=int, default=10)
+    parser.add_argument("--fixed", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10000)
+    args = parser.parse_args()
+
+    text = make_sweep(args.axes, args.values, args.fixed)
+    (sweep, prelude) = e2e._parse_and_preprocess_sweep(text)
+
+    def render_from_scratch():
+        for config in sweeps.generate_configs(sweep):
+            config = config._replace(statements=(prelude + config.statements))
+            yield rendering.render(config)
+
+    def render_from_template():
+        template = rendering.compile_sweep_template(sweep, prelude)
+        yield from rendering.render_template(template)
+
+    (expected, scratch_time) = measure(render_from_scratch(), args.limit)
+    (actual, template_time) = measure(render_from_template(), args.limit)
+    assert actual == expected, "Template rendering differs from the render fold."
+
+    n_configs = len(expected)
+    print(f"configs: {n_configs}")
+    print(f"render fold: {n_configs / scratch_time:.0f} configs/sec")
+    print(f"template:    {n_configs / template_time:.0f} configs/sec")
+
+
+if __name__ == "__main__":
+    main()
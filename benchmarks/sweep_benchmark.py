@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+# End-to-end benchmark of sweep generation on representative sweep shapes, through
+# e2e.parse_sweep ("api") and the command line tool writing config files ("cli").
+# Reports the throughput, peak memory and time to the first config of every case.
+# Results can be saved as a baseline, and compared against one to flag
+# regressions.
+#
+# Every case runs in a fresh process, so peak memory isn't shared between them.
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue as queue_module
+import resource
+import sys
+import tempfile
+import time
+
+from hyperion import cli
+from hyperion import e2e
+
+
+def factors(n, base=10):
+    # Splits n into axis sizes of base values, and the remainder.
+    sizes = []
+    while n % base == 0 and n > base:
+        sizes.append(base)
+        n //= base
+    sizes.append(n)
+    return sizes
+
+
+def axis(name, n_values, value=lambda j: str(j)):
+    return f"{name}: [" + ", ".join(value(j) for j in range(n_values)) + "]"
+
+
+def axes(prefix, n, value=lambda j: str(j)):
+    return [
+        axis(f"{prefix}{i}", n_values, value) for (i, n_values) in enumerate(factors(n))
+    ]
+
+
+def indent(lines):
+    return ["    " + line for line in lines]
+
+
+def wide_product(n):
+    return axes("model.axis_", n)
+
+
+def deep_union_of_products(n, depth=2):
+    def make_block(n, depth, prefix):
+        if depth == 0 or n % 10:
+            return axes(f"{prefix}axis_", n)
+
+        # Two branches of 5 * n / 10 configs each.
+        lines = ["union:"]
+        for branch in range(2):
+            branch_prefix = f"{prefix}b{branch}_"
+            lines += indent(
+                ["product:"]
+                + indent(
+                    [axis(f"{branch_prefix}x", 5)]
+                    + make_block(n // 10, depth - 1, branch_prefix)
+                )
+            )
+        return lines
+
+    return make_block(n, depth, "model.")
+
+
+def big_table(n, max_rows=100):
+    # Parsing tables is slow (about 20 s for 1000 rows), so bigger sizes multiply
+    # the table by a product of axes.
+    n_rows = math.gcd(n, max_rows)
+    lines = ["table model.a, model.b, model.c:"]
+    lines += indent([f"{i}, {i} * 0.5, 'row_{i}'" for i in range(n_rows)])
+    if n > n_rows:
+        lines += axes("model.axis_", n // n_rows)
+    return lines
+
+
+def expressions(n):
+    lines = [f"m{i} = {i + 1}" for i in range(20)]
+    lines += [f"model.e{i} = %m{i} * 2 + %m{(i + 1) % 20} ** 2 - 1" for i in range(20)]
+    lines += axes("model.axis_", n, value=lambda j: f"%m{j % 20} * {j} + 0.5")
+    return lines
+
+
+def calls(n):
+    lines = [f"model.fixed_{i} = @compute(base={i}, scale={i} * 2)" for i in range(20)]
+    lines += axes("model.axis_", n, value=lambda j: f"@make(index={j}, half={j} / 2)")
+    return lines
+
+
+def nested_with(n, depth=4):
+    lines = axes("axis_", n) + ["fixed = 2"]
+    for i in reversed(range(depth)):
+        lines = [f"with level_{i}:"] + indent(lines)
+    return ["model.fixed = 1"] + lines
+
+
+shapes = {
+    "wide_product": wide_product,
+    "deep_union_of_products": deep_union_of_products,
+    "big_table": big_table,
+    "expressions": expressions,
+    "calls": calls,
+    "nested_with": nested_with,
+}
+
+
+def peak_memory():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_api(text):
+    start = time.perf_counter()
+    time_to_first_config = None
+    n_configs = 0
+    for _ in e2e.parse_sweep(text):
+        if time_to_first_config is None:
+            time_to_first_config = time.perf_counter() - start
+        n_configs += 1
+    return (n_configs, time.perf_counter() - start, time_to_first_config)
+
+
+def run_cli(text):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sweep_path = os.path.join(tmp_dir, "sweep.hyp")
+        with open(sweep_path, "w") as f:
+            f.write(text)
+        output_dir = os.path.join(tmp_dir, "configs")
+
+        # The case runs in its own process, so we can wrap cli.write_file to time
+        # the first config file.
+        first_write_times = []
+        write_file = cli.write_file
+
+        def timed_write_file(path, text):
+            write_file(path, text)
+            if not first_write_times:
+                first_write_times.append(time.perf_counter())
+
+        cli.write_file = timed_write_file
+        try:
+            start = time.perf_counter()
+            cli.main([sweep_path, output_dir])
+            elapsed = time.perf_counter() - start
+        finally:
+            cli.write_file = write_file
+        time_to_first_config = first_write_times[0] - start
+        return (len(os.listdir(output_dir)), elapsed, time_to_first_config)
+
+
+paths = {"api": run_api, "cli": run_cli}
+
+
+def run_case(shape, size, path, queue):
+    text = "\n".join(shapes[shape](size)) + "\n"
+    try:
+        (n_configs, elapsed, time_to_first_config) = paths[path](text)
+        assert n_configs == size, f"Expected {size} configs, got {n_configs}."
+    except Exception as e:
+        queue.put({"error": repr(e)})
+        raise
+
+    queue.put(
+        {
+            "configs": n_configs,
+            "seconds": elapsed,
+            "configs_per_second": n_configs / elapsed,
+            "peak_memory": peak_memory(),
+            "time_to_first_config": time_to_first_config,
+        }
+    )
+
+
+def run_in_subprocess(shape, size, path):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_case, args=(shape, size, path, queue))
+    process.start()
+    # The process can die without reporting, e.g. killed for running out of memory,
+    # so we poll it while waiting for the result.
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1)
+        except queue_module.Empty:
+            if not process.is_alive():
+                # It could have reported right before exiting.
+                try:
+                    result = queue.get(timeout=1)
+                except queue_module.Empty:
+                    result = {"error": f"exit code {process.exitcode}"}
+    process.join()
+    if "error" in result:
+        raise RuntimeError(f"{shape}/{size}/{path} failed: {result['error']}")
+    return result
+
+
+# Metrics compared against the baseline, with True if higher is better.
+compared_metrics = {
+    "configs_per_second": True,
+    "peak_memory": False,
+    "time_to_first_config": False,
+}
+
+
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for (case, result) in results.items():
+        if case not in baseline:
+            continue
+        for (metric, higher_is_better) in compared_metrics.items():
+            (value, baseline_value) = (result[metric], baseline[case][metric])
+            if value is None or not baseline_value:
+                continue
+            change = value / baseline_value - 1
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append((case, metric, baseline_value, value, change))
+    return regressions
+
+
+def format_result(case, result):
+    time_to_first_config = result["time_to_first_config"]
+    first = "-" if time_to_first_config is None else f"{time_to_first_config:.3f}"
+    return (
+        f"{case:<40} {result['configs_per_second']:>12.0f} "
+        f"{result['peak_memory'] / 2**20:>10.1f} {first:>10}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark sweep generation end to end on representative sweep "
+        "shapes, and compare the results against a baseline."
+    )
+    parser.add_argument(
+        "--shapes", nargs="+", choices=sorted(shapes), default=sorted(shapes)
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=lambda size: int(float(size)),
+        default=[10**3, 10**4],
+        help="numbers of configs, e.g. 1e3 1e6",
+    )
+    parser.add_argument("--paths", nargs="+", choices=sorted(paths), default=["api"])
+    parser.add_argument("--baseline", help="JSON file with results to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative change counted as a regression",
+    )
+    parser.add_argument("--save", help="save the results as JSON, e.g. a baseline")
+    args = parser.parse_args()
+
+    print(f"{'case':<40} {'configs/s':>12} {'peak MiB':>10} {'first s':>10}")
+    results = {}
+    for shape in args.shapes:
+        for size in args.sizes:
+            for path in args.paths:
+                case = f"{shape}/{size}/{path}"
+                results[case] = run_in_subprocess(shape, size, path)
+                print(format_result(case, results[case]), flush=True)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for (case, metric, baseline_value, value, change) in regressions:
+            print(
+                f"REGRESSION {case} {metric}: {baseline_value:.4g} -> {value:.4g} "
+                f"({change:+.1%})"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,4 +6,39 @@ from hyperion.e2e import (
     parse_sweep,
     parse_sweep_file,
     parse_sweep_files_and_bindings,
+    parse_sweep_delta,
+    parse_sweep_file_delta,
+    parse_delta_config_files,
+    compile_sweep_file,
+    config_at,
+    save_compiled_sweep,
+    save_compiled_sweep_file,
+    load_compiled_sweep,
 )
+from hyperion.aio import (
+    aparse_sweep,
+    aparse_sweep_file,
+    aparse_sweep_files_and_bindings,
+)
+from hyperion.columns import (
+    sweep_to_columns,
+    sweep_file_to_columns,
+)
+from hyperion.archive import (
+    open_archive,
+    parse_archive_config,
+)
+from hyperion.stream import read_stream
+from hyperion.evaluation import (
+    evaluate_config,
+    evaluate_sweep,
+)
+from hyperion.registry import (
+    apply_config,
+    compile_config,
+    generate_compiled_configs,
+    save_compiled_config,
+    load_compiled_config,
+    parse_compiled_config_file,
+)
+from hyperion.registry import sweep_session
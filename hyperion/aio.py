@@ -0,0 +1,98 @@
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+
+from hyperion import e2e
+
+
+# Async variants of the sweep API, for asyncio services. Reading the files,
+# parsing and rendering run in a dedicated thread, so the event loop stays
+# responsive. The configs are handed over in batches of batch_size, and at most
+# prefetch batches are generated ahead of the consumer, which bounds the memory
+# when it falls behind.
+
+default_batch_size = 64
+default_prefetch = 2
+
+
+async def _aiterate(make_configs, batch_size, prefetch):
+    loop = asyncio.get_running_loop()
+    # One thread, so the batches are generated in order.
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    configs = None
+
+    def next_batch():
+        nonlocal configs
+        if configs is None:
+            configs = make_configs()
+        return list(itertools.islice(configs, batch_size))
+
+    def close_configs():
+        if configs is not None:
+            configs.close()
+
+    pending = collections.deque()
+    try:
+        while True:
+            while len(pending) < prefetch:
+                pending.append(loop.run_in_executor(executor, next_batch))
+            batch = await pending.popleft()
+            if not batch:
+                return
+
+            for config in batch:
+                yield config
+    finally:
+        # Don't block the loop waiting for a batch in progress if the consumer
+        # stops early. The generator is closed in the thread after that batch,
+        # which e.g. shuts down the worker processes of parallel rendering.
+        for future in pending:
+            future.cancel()
+        executor.submit(close_configs)
+        executor.shutdown(wait=False)
+
+
+def aparse_sweep(
+    bindings,
+    dedupe=None,
+    workers=None,
+    batch_size=default_batch_size,
+    prefetch=default_prefetch,
+):
+    return _aiterate(
+        lambda: e2e.parse_sweep(bindings, dedupe=dedupe, workers=workers),
+        batch_size,
+        prefetch,
+    )
+
+
+def aparse_sweep_file(
+    sweep_file,
+    dedupe=None,
+    workers=None,
+    batch_size=default_batch_size,
+    prefetch=default_prefetch,
+):
+    return _aiterate(
+        lambda: e2e.parse_sweep_file(sweep_file, dedupe=dedupe, workers=workers),
+        batch_size,
+        prefetch,
+    )
+
+
+def aparse_sweep_files_and_bindings(
+    sweep_files=(),
+    bindings="",
+    dedupe=None,
+    workers=None,
+    batch_size=default_batch_size,
+    prefetch=default_prefetch,
+):
+    return _aiterate(
+        lambda: e2e.parse_sweep_files_and_bindings(
+            sweep_files, bindings, dedupe=dedupe, workers=workers
+        ),
+        batch_size,
+        prefetch,
+    )
@@ -0,0 +1,112 @@
+import asyncio
+import itertools
+import threading
+
+import pytest
+
+from hyperion import aio
+from hyperion import e2e
+
+
+sweep = """
+f.a: [1, 2, 3, 4, 5]
+f.b: ['x', 'y', 'z']
+"""
+
+
+async def collect(configs):
+    return [config async for config in configs]
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 100])
+@pytest.mark.parametrize("prefetch", [1, 3])
+def test_aparse_sweep_equals_parse_sweep(batch_size, prefetch):
+    configs = aio.aparse_sweep(sweep, batch_size=batch_size, prefetch=prefetch)
+    assert asyncio.run(collect(configs)) == list(e2e.parse_sweep(sweep))
+
+
+def test_aparse_sweep_files_and_bindings(tmp_path):
+    sweep_path = tmp_path / "sweep.hyp"
+    sweep_path.write_text(sweep)
+    expected = list(e2e.parse_sweep_files_and_bindings([sweep_path], "f.c = 1"))
+
+    assert asyncio.run(collect(aio.aparse_sweep_file(sweep_path))) == list(
+        e2e.parse_sweep_file(sweep_path)
+    )
+    assert (
+        asyncio.run(
+            collect(aio.aparse_sweep_files_and_bindings([sweep_path], "f.c = 1"))
+        )
+        == expected
+    )
+
+
+def test_errors_are_raised_in_the_consumer():
+    sweep = "table f.a, f.b:\n    1, 2\n    3\n"
+    with pytest.raises(ValueError, match="inconsistent number of columns"):
+        asyncio.run(collect(aio.aparse_sweep(sweep)))
+
+
+def test_generator_is_closed_when_the_consumer_stops_early(monkeypatch):
+    closed = threading.Event()
+    # Keeps the generator alive, so it isn't closed by the garbage collector.
+    generators = []
+
+    def generate_configs():
+        try:
+            yield from itertools.count()
+        finally:
+            closed.set()
+
+    def parse_sweep(bindings, dedupe, workers):
+        generators.append(generate_configs())
+        return generators[-1]
+
+    monkeypatch.setattr(e2e, "parse_sweep", parse_sweep)
+
+    async def main():
+        configs = aio.aparse_sweep(sweep, batch_size=2)
+        async for config in configs:
+            break
+        await configs.aclose()
+
+    asyncio.run(main())
+    assert closed.wait(timeout=5)
+
+
+def test_event_loop_stays_responsive():
+    big_sweep = "\n".join(f"f.a{i}: [1, 2, 3, 4]" for i in range(6))
+
+    async def main():
+        ticks = 0
+        stop = asyncio.Event()
+
+        async def tick():
+            nonlocal ticks
+            while not stop.is_set():
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.create_task(tick())
+        n_configs = 0
+        async for _ in aio.aparse_sweep(big_sweep, batch_size=16):
+            n_configs += 1
+        stop.set()
+        await ticker
+        return (n_configs, ticks)
+
+    (n_configs, ticks) = asyncio.run(main())
+    assert n_configs == 4**6
+    # The ticker ran while the batches were being generated.
+    assert ticks > n_configs // 16
+
+
+def test_consumer_can_stop_early():
+    async def main():
+        configs = aio.aparse_sweep(sweep, batch_size=2)
+        async for config in configs:
+            break
+        await configs.aclose()
+        return config
+
+    assert asyncio.run(main()) == next(e2e.parse_sweep(sweep))
@@ -0,0 +1,107 @@
+import array
+import mmap
+import os
+import struct
+import sys
+
+from hyperion import e2e
+
+
+# Sweep archives pack all configs of a sweep into one file:
+#
+#     magic | config_0 | ... | config_{n-1} | index | footer
+#
+# where the configs are UTF-8 encoded, index is an array of n + 1 offsets of the
+# configs in the file, the last one pointing to the end of the configs, and footer
+# holds the offset of the index, n and the magic again. Everything is
+# little-endian. Config i can then be read in O(1), without scanning the file.
+
+magic = b"HYPARC1\n"
+extension = ".hyparc"
+_offset_format = "<Q"
+_footer_format = "<QQ8s"
+
+
+def write_archive(path, configs):
+    # Writes to a temporary file first, so a failure doesn't leave a truncated
+    # archive behind. Returns the number of configs.
+    offsets = array.array("Q")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(magic)
+        offset = len(magic)
+        for config in configs:
+            offsets.append(offset)
+            data = config.encode()
+            f.write(data)
+            offset += len(data)
+        offsets.append(offset)
+
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        f.write(offsets.tobytes())
+        f.write(struct.pack(_footer_format, offset, len(offsets) - 1, magic))
+
+    os.replace(tmp_path, path)
+    return len(offsets) - 1
+
+
+class Archive:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        footer_size = struct.calcsize(_footer_format)
+        if len(self._mmap) < len(magic) + footer_size:
+            self.close()
+            raise ValueError(f"Not a sweep archive: {path}.")
+
+        (self._index_offset, self._n_configs, footer_magic) = struct.unpack_from(
+            _footer_format, self._mmap, len(self._mmap) - footer_size
+        )
+        if self._mmap[: len(magic)] != magic or footer_magic != magic:
+            self.close()
+            raise ValueError(f"Not a sweep archive: {path}.")
+
+    def _offset(self, index):
+        (offset,) = struct.unpack_from(
+            _offset_format,
+            self._mmap,
+            self._index_offset + index * struct.calcsize(_offset_format),
+        )
+        return offset
+
+    def __len__(self):
+        return self._n_configs
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._n_configs
+        if not 0 <= index < self._n_configs:
+            raise IndexError("Config index out of range.")
+
+        return self._mmap[self._offset(index) : self._offset(index + 1)].decode()
+
+    def __iter__(self):
+        for index in range(self._n_configs):
+            yield self[index]
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_archive(path):
+    return Archive(path)
+
+
+def parse_archive_config(path, index, skip_unknown=False):
+    # Helper for the training scripts - loads config number index into Gin.
+    with open_archive(path) as archive:
+        config = archive[index]
+    return e2e.gin_module.parse_config(config, skip_unknown=skip_unknown)
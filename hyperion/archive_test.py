@@ -0,0 +1,35 @@
+import hypothesis as ht
+from hypothesis import strategies as st
+import pytest
+
+from hyperion import archive
+from hyperion import testing
+
+
+@ht.given(st.lists(st.text(st.characters(blacklist_categories=("Cs",)))))
+def test_archive_returns_written_configs(tmp_path_factory, configs):
+    path = str(tmp_path_factory.mktemp("archive") / "sweep.hyparc")
+    assert archive.write_archive(path, iter(configs)) == len(configs)
+    with archive.open_archive(path) as sweep_archive:
+        assert len(sweep_archive) == len(configs)
+        assert list(sweep_archive) == configs
+        for index in range(-len(configs), len(configs)):
+            assert sweep_archive[index] == configs[index]
+        with pytest.raises(IndexError):
+            sweep_archive[len(configs)]
+
+
+def test_open_archive_rejects_other_files(tmp_path):
+    path = tmp_path / "sweep_0.gin"
+    path.write_text("a.x = 1\n" * 10)
+    with pytest.raises(ValueError):
+        archive.open_archive(str(path))
+
+
+def test_parse_archive_config_loads_config_into_gin(tmp_path):
+    path = str(tmp_path / "sweep.hyparc")
+    archive.write_archive(path, ["f.x = 1", "f.x = 2"])
+    with testing.gin_sandbox() as gin:
+        f = gin.external_configurable(lambda x: x, name="f")
+        archive.parse_archive_config(path, 1)
+        assert f() == 2
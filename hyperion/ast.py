@@ -126,3 +126,6 @@ Union = hashable_namedtuple("Union", ["statements"])
 Table = hashable_namedtuple("Table", ["header", "rows"])
 Header = hashable_namedtuple("Header", ["identifiers"])
 Row = hashable_namedtuple("Row", ["exprs"])
+Where = hashable_namedtuple("Where", ["expr"])
+# Table with the rows in a file, read lazily during generation.
+ExternalTable = hashable_namedtuple("ExternalTable", ["header", "source"])
@@ -0,0 +1,409 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import re
+import sys
+
+from hyperion import archive
+from hyperion import columns
+from hyperion import e2e
+from hyperion import parallel
+from hyperion import profiling
+from hyperion import rendering
+from hyperion import runner
+from hyperion import stream
+from hyperion import sweeps
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description="Hyperion config generator.")
+    parser.add_argument("sweep", help="sweep file")
+    parser.add_argument(
+        "output_dir", nargs="?", help="directory to output the configs to"
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=sorted(sweeps.dedupe_modes),
+        help="skip configs identical to an earlier one; bloom uses bounded memory, "
+        "but may drop a small fraction of unique configs",
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="write the bindings shared by all configs to {name}_base.gin and only "
+        "the varying ones to the per-config files",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="pack all configs into one {name}.hyparc file with an index, instead "
+        "of writing one file per config",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep a manifest of content hashes in output_dir and only rewrite the "
+        "configs that changed since the last run, removing the stale ones",
+    )
+    parser.add_argument(
+        "--stream",
+        choices=sorted(stream.encoders),
+        help="write the configs to stdout as they're generated, instead of to "
+        "output_dir: separated by NUL bytes, each preceded by its length as a "
+        "little-endian uint64, or as JSON lines with the index and text",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        metavar="N",
+        help="render and write the configs in N worker processes",
+    )
+    parser.add_argument(
+        "--columns",
+        metavar="PATH",
+        help="export the values of the varying bindings as a table with one row per "
+        "config, to a .csv or .npz file",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the time spent in every stage of the generation to stderr",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="also trace the peak and retained memory of every stage and sweep node "
+        "type, and print the profile; this slows generation down",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="PATH",
+        help="write the profile of the generation to a JSON file",
+    )
+    return parser
+
+
+def write_file(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    # Sweep files named like a command take precedence.
+    if argv and argv[0] in commands and not os.path.isfile(argv[0]):
+        (command, *argv) = argv
+        commands[command](argv)
+        return
+
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    if args.output_dir is None and args.columns is None and args.stream is None:
+        parser.error("specify output_dir, --stream or --columns")
+    if args.output_dir is not None and args.stream is not None:
+        parser.error("--stream writes the configs to stdout, not to output_dir")
+    if args.stream is not None and args.delta:
+        parser.error("--stream can't be combined with --delta")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.jobs is not None and args.dedupe is not None:
+        parser.error("--dedupe requires generating the configs sequentially")
+    if args.archive and args.delta:
+        parser.error("--archive can't be combined with --delta")
+    if args.archive and args.incremental:
+        parser.error("--archive can't be combined with --incremental")
+
+    if args.profile or args.profile_memory or args.profile_json is not None:
+        with profiling.profile(memory=args.profile_memory) as profile:
+            run(args)
+        if args.profile or args.profile_memory:
+            print(profile.format(), file=sys.stderr)
+        if args.profile_json is not None:
+            write_file(args.profile_json, profile.to_json())
+    else:
+        run(args)
+
+
+def run(args):
+    if args.columns is not None:
+        columns.save_columns(
+            columns.sweep_file_to_columns(args.sweep, dedupe=args.dedupe),
+            args.columns,
+        )
+
+    if args.output_dir is not None:
+        write_configs(args)
+
+    if args.stream is not None:
+        stream_configs(args)
+
+
+def render_configs(args, template):
+    if args.jobs is not None:
+        return parallel.render_template(template, args.jobs)
+    else:
+        return rendering.render_template(template, dedupe=args.dedupe)
+
+
+def stream_configs(args):
+    template = e2e.compile_sweep_file(args.sweep)
+    configs = render_configs(args, template)
+    try:
+        stream.write_stream(configs, sys.stdout.buffer, args.stream)
+    except BrokenPipeError:
+        # The consumer stopped reading, e.g. `| head`. Stop rendering, and point
+        # stdout at devnull, so flushing it at exit doesn't fail again.
+        configs.close()
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+
+def write_configs(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    (name_core, _) = os.path.splitext(os.path.basename(args.sweep))
+
+    def file_name(suffix):
+        return f"{name_core}_{suffix}.gin"
+
+    if args.delta:
+        (base, template) = e2e.compile_sweep_file_delta(args.sweep)
+        files = [(file_name("base"), base)]
+    else:
+        template = e2e.compile_sweep_file(args.sweep)
+        files = []
+
+    if args.archive:
+        configs = render_configs(args, template)
+        archive_path = os.path.join(args.output_dir, name_core + archive.extension)
+        archive.write_archive(archive_path, configs)
+        return
+
+    if args.jobs is not None and not args.incremental:
+        for (name, text) in files:
+            write_file(os.path.join(args.output_dir, name), text)
+        # Workers write the files themselves, in any order.
+        parallel.write_template(
+            template,
+            args.jobs,
+            path_prefix=os.path.join(args.output_dir, f"{name_core}_"),
+            path_suffix=".gin",
+        )
+        return
+
+    configs = render_configs(args, template)
+    files = itertools.chain(
+        files, ((file_name(i), config) for (i, config) in enumerate(configs))
+    )
+
+    if args.incremental:
+        manifest_path = os.path.join(args.output_dir, f"{name_core}_manifest.json")
+        name_pattern = re.escape(name_core) + r"_(\d+|base)\.gin"
+        counts = write_files_incrementally(
+            args.output_dir, files, manifest_path, name_pattern
+        )
+        print(", ".join(f"{counts[change]} {change}" for change in manifest_changes))
+    else:
+        for (name, text) in files:
+            write_file(os.path.join(args.output_dir, name), text)
+
+
+# Running the configs:
+# ====================
+
+
+def make_run_parser():
+    parser = argparse.ArgumentParser(
+        prog="hyperion run",
+        description="Run a command for every config of a sweep, in parallel local "
+        "processes. Rerunning resumes the sweep, skipping the succeeded runs.",
+    )
+    parser.add_argument("sweep", help="sweep file")
+    parser.add_argument(
+        "command",
+        nargs="*",
+        help="command to run, after --; {config} is replaced with the path of the "
+        "config file, or appended if absent, and {index} with its index",
+    )
+    parser.add_argument(
+        "--warm",
+        metavar="MODULE:FUNCTION",
+        help="instead of a command, import the module once in a server process, "
+        "and for every config fork it, bind the config in Gin and call the function",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        metavar="N",
+        default=os.cpu_count(),
+        help="number of runs at a time, by default the number of CPUs",
+    )
+    parser.add_argument(
+        "--run-dir",
+        metavar="DIR",
+        default="runs",
+        help="directory for the configs, logs and the status of the runs",
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=sorted(sweeps.dedupe_modes),
+        help="skip configs identical to an earlier one",
+    )
+    return parser
+
+
+def run_command(argv):
+    parser = make_run_parser()
+    # argparse doesn't match an optional positional after options and --, so we
+    # split off the command ourselves.
+    command = []
+    if "--" in argv:
+        split = argv.index("--")
+        (argv, command) = (argv[:split], argv[split + 1 :])
+    args = parser.parse_args(argv)
+    args.command += command
+    if bool(args.command) == (args.warm is not None):
+        parser.error("specify either a command or --warm")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    def report(index, outcome, returncode):
+        if outcome == "failed":
+            log_path = runner.run_path_prefix(args.run_dir, args.sweep, index) + ".log"
+            print(
+                f"Run {index} failed with exit code {returncode}, see {log_path}.",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    if args.warm is not None:
+        run_sweep = runner.run_sweep_warm(
+            args.sweep,
+            args.warm,
+            args.run_dir,
+            args.jobs,
+            dedupe=args.dedupe,
+            report=report,
+        )
+    else:
+        run_sweep = runner.run_sweep(
+            args.sweep,
+            args.command,
+            args.run_dir,
+            args.jobs,
+            dedupe=args.dedupe,
+            report=report,
+        )
+    counts = asyncio.run(run_sweep)
+    print(", ".join(f"{counts[outcome]} {outcome}" for outcome in runner.run_outcomes))
+    if counts["failed"]:
+        sys.exit(1)
+
+
+# Compiling sweeps:
+# =================
+
+
+def make_compile_parser():
+    parser = argparse.ArgumentParser(
+        prog="hyperion compile",
+        description="Preprocess a sweep into a compiled sweep file, which the other "
+        "commands accept in place of the sweep file and load without parsing.",
+    )
+    parser.add_argument("sweep", help="sweep file")
+    parser.add_argument(
+        "--output",
+        "-o",
+        metavar="PATH",
+        help="path of the compiled sweep, by default the sweep file with the "
+        f"extension replaced with {e2e.compiled_sweep_extension}",
+    )
+    return parser
+
+
+def compile_command(argv):
+    args = make_compile_parser().parse_args(argv)
+    output = args.output
+    if output is None:
+        (path_core, _) = os.path.splitext(args.sweep)
+        output = path_core + e2e.compiled_sweep_extension
+    e2e.save_compiled_sweep_file(args.sweep, output)
+
+
+# Subcommands, dispatched on the first argument. Anything else is a sweep file.
+commands = {"run": run_command, "compile": compile_command}
+
+
+# Incremental output:
+# ===================
+#
+# With --incremental, we keep a manifest with a hash of every written file in the
+# output directory. When regenerating the configs, files with unchanged content
+# are left untouched, so their modification times stay the same, and files that
+# are no longer generated are removed. Without a manifest, e.g. after a run
+# without --incremental, the files in the output directory named like the
+# generated ones are taken to be from an earlier run, and hashed when they're
+# generated again.
+
+manifest_changes = ("added", "changed", "removed", "unchanged")
+
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def write_files_incrementally(output_dir, files, manifest_path, name_pattern=None):
+    # files is an iterable of pairs (name, text). name_pattern is a regex matching
+    # the names of the generated files. Returns a Counter with the number of files
+    # per change in manifest_changes.
+    if os.path.exists(manifest_path) or name_pattern is None:
+        old_manifest = read_manifest(manifest_path)
+    else:
+        old_manifest = {
+            name: None
+            for name in os.listdir(output_dir)
+            if re.fullmatch(name_pattern, name)
+        }
+    new_manifest = {}
+    counts = collections.Counter({change: 0 for change in manifest_changes})
+    for (name, text) in files:
+        digest = runner.content_hash(text)
+        new_manifest[name] = digest
+        path = os.path.join(output_dir, name)
+        if name in old_manifest and old_manifest[name] is None:
+            with open(path) as f:
+                old_manifest[name] = runner.content_hash(f.read())
+        if name not in old_manifest:
+            counts["added"] += 1
+        elif old_manifest[name] != digest or not os.path.exists(path):
+            counts["changed"] += 1
+        else:
+            counts["unchanged"] += 1
+            continue
+        write_file(path, text)
+
+    for name in sorted(old_manifest.keys() - new_manifest.keys()):
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+        counts["removed"] += 1
+
+    write_manifest(manifest_path, new_manifest)
+    return counts
@@ -0,0 +1,219 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from hyperion import archive
+from hyperion import cli
+
+
+sweep = """
+a.x = 1
+a.y: [1, 2]
+"""
+
+
+@pytest.fixture
+def sweep_path(tmp_path):
+    path = tmp_path / "sweep.hyp"
+    path.write_text(sweep)
+    return str(path)
+
+
+def read_outputs(output_dir):
+    return {name: (output_dir / name).read_text() for name in os.listdir(output_dir)}
+
+
+def test_writes_one_file_per_config(sweep_path, tmp_path):
+    output_dir = tmp_path / "configs"
+    cli.main([sweep_path, str(output_dir)])
+    assert read_outputs(output_dir) == {
+        "sweep_0.gin": "a.x = 1\na.y = 1",
+        "sweep_1.gin": "a.x = 1\na.y = 2",
+    }
+
+
+def test_writes_base_and_deltas(sweep_path, tmp_path):
+    output_dir = tmp_path / "configs"
+    cli.main([sweep_path, str(output_dir), "--delta"])
+    assert read_outputs(output_dir) == {
+        "sweep_base.gin": "a.x = 1",
+        "sweep_0.gin": "a.y = 1",
+        "sweep_1.gin": "a.y = 2",
+    }
+
+
+def test_exports_columns_to_csv(sweep_path, tmp_path):
+    columns_path = tmp_path / "columns.csv"
+    cli.main([sweep_path, "--columns", str(columns_path)])
+    assert columns_path.read_text().splitlines() == ["a.y", "1", "2"]
+
+
+@pytest.mark.parametrize("flags", [[], ["--delta"]])
+def test_jobs_write_the_same_files(sweep_path, tmp_path, flags):
+    sequential_dir = tmp_path / "sequential"
+    cli.main([sweep_path, str(sequential_dir)] + flags)
+    parallel_dir = tmp_path / "parallel"
+    cli.main([sweep_path, str(parallel_dir), "--jobs", "2"] + flags)
+    assert read_outputs(parallel_dir) == read_outputs(sequential_dir)
+
+
+def test_writes_archive(sweep_path, tmp_path):
+    output_dir = tmp_path / "configs"
+    cli.main([sweep_path, str(output_dir), "--archive"])
+    assert os.listdir(output_dir) == ["sweep.hyparc"]
+    with archive.open_archive(str(output_dir / "sweep.hyparc")) as sweep_archive:
+        assert list(sweep_archive) == ["a.x = 1\na.y = 1", "a.x = 1\na.y = 2"]
+
+
+def test_incremental_rewrites_only_changed_configs(sweep_path, tmp_path, capsys):
+    output_dir = tmp_path / "configs"
+    cli.main([sweep_path, str(output_dir), "--incremental"])
+    assert capsys.readouterr().out == "2 added, 0 changed, 0 removed, 0 unchanged\n"
+    unchanged_path = output_dir / "sweep_0.gin"
+    os.utime(unchanged_path, ns=(0, 0))
+
+    with open(sweep_path, "w") as f:
+        f.write("a.x = 1\na.y: [1, 3, 4]\n")
+    cli.main([sweep_path, str(output_dir), "--incremental"])
+    assert capsys.readouterr().out == "1 added, 1 changed, 0 removed, 1 unchanged\n"
+    assert os.stat(unchanged_path).st_mtime_ns == 0
+
+    with open(sweep_path, "w") as f:
+        f.write("a.x = 1\na.y = 1\n")
+    cli.main([sweep_path, str(output_dir), "--incremental"])
+    assert capsys.readouterr().out == "0 added, 0 changed, 2 removed, 1 unchanged\n"
+    assert sorted(os.listdir(output_dir)) == ["sweep_0.gin", "sweep_manifest.json"]
+    assert os.stat(unchanged_path).st_mtime_ns == 0
+
+
+def test_incremental_removes_stale_configs_of_a_full_run(sweep_path, tmp_path, capsys):
+    output_dir = tmp_path / "configs"
+    with open(sweep_path, "w") as f:
+        f.write("a.x = 1\na.y: [1, 2, 3]\n")
+    cli.main([sweep_path, str(output_dir), "--delta"])
+    (output_dir / "other_0.gin").write_text("")
+    cli.main([sweep_path, str(output_dir)])
+    unchanged_path = output_dir / "sweep_0.gin"
+    os.utime(unchanged_path, ns=(0, 0))
+
+    with open(sweep_path, "w") as f:
+        f.write("a.x = 1\na.y: [1, 3]\n")
+    cli.main([sweep_path, str(output_dir), "--incremental"])
+    assert capsys.readouterr().out == "0 added, 1 changed, 2 removed, 1 unchanged\n"
+    assert os.stat(unchanged_path).st_mtime_ns == 0
+    assert sorted(os.listdir(output_dir)) == [
+        "other_0.gin",
+        "sweep_0.gin",
+        "sweep_1.gin",
+        "sweep_manifest.json",
+    ]
+
+
+def test_streams_configs_to_stdout(sweep_path, capsysbinary):
+    cli.main([sweep_path, "--stream", "nul"])
+    assert capsysbinary.readouterr().out == b"a.x = 1\na.y = 1\0a.x = 1\na.y = 2\0"
+
+
+def test_stops_quietly_when_the_consumer_stops_reading(tmp_path):
+    sweep_path = tmp_path / "sweep.hyp"
+    values = list(range(100))
+    sweep_path.write_text(f"a.x: {values}\na.y: {values}\n")
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from hyperion import cli; cli.main()",
+            str(sweep_path),
+            "--stream",
+            "jsonl",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    assert json.loads(process.stdout.readline())["index"] == 0
+    process.stdout.close()
+    assert process.stderr.read() == b""
+    assert process.wait() == 1
+
+
+def test_writes_profile(sweep_path, tmp_path, capsys):
+    profile_path = tmp_path / "profile.json"
+    cli.main(
+        [sweep_path, str(tmp_path / "configs"), "--profile-json", str(profile_path)]
+    )
+    profile = json.loads(profile_path.read_text())
+    assert profile["configs"] == 2
+    assert "parsing.parse_sweep" in profile["stages"]
+
+
+def test_profile_counts_configs_written_by_workers(sweep_path, tmp_path):
+    profile_path = tmp_path / "profile.json"
+    argv = [sweep_path, str(tmp_path / "configs"), "--jobs", "2"]
+    cli.main(argv + ["--profile-json", str(profile_path)])
+    assert json.loads(profile_path.read_text())["configs"] == 2
+
+
+def test_sweep_files_named_like_commands_are_not_dispatched(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "run").write_text(sweep)
+    cli.main(["run", "configs"])
+    assert sorted(os.listdir(tmp_path / "configs")) == ["run_0.gin", "run_1.gin"]
+
+
+def test_runs_a_command_for_every_config(sweep_path, tmp_path, capsys):
+    run_dir = tmp_path / "runs"
+    argv = ["run", sweep_path, "--run-dir", str(run_dir), "-j", "2", "--"]
+    argv += [
+        sys.executable,
+        "-c",
+        "import sys; sys.exit('2' in open(sys.argv[1]).read())",
+    ]
+    with pytest.raises(SystemExit):
+        cli.main(argv)
+    assert capsys.readouterr().out == "1 succeeded, 1 failed, 0 skipped\n"
+
+    # Resumes, rerunning only the failed config.
+    with pytest.raises(SystemExit):
+        cli.main(argv)
+    assert capsys.readouterr().out == "0 succeeded, 1 failed, 1 skipped\n"
+
+
+def test_run_needs_either_a_command_or_warm(sweep_path):
+    with pytest.raises(SystemExit):
+        cli.main(["run", sweep_path])
+    with pytest.raises(SystemExit):
+        cli.main(["run", sweep_path, "--warm", "trainer:main", "--", "python"])
+
+
+def test_compiled_sweep_generates_the_same_files(sweep_path, tmp_path):
+    cli.main(["compile", sweep_path])
+    compiled_path = sweep_path[: -len(".hyp")] + ".hypc"
+    cli.main([compiled_path, str(tmp_path / "compiled")])
+    cli.main([sweep_path, str(tmp_path / "parsed")])
+    assert read_outputs(tmp_path / "compiled") == read_outputs(tmp_path / "parsed")
+
+    # Elsewhere, the tables are still found and the source is still checked.
+    (tmp_path / "rows.csv").write_text("b\n1\n2\n")
+    with open(sweep_path, "a") as f:
+        f.write("table a.b from 'rows.csv'\n")
+    (tmp_path / "build").mkdir()
+    output_path = str(tmp_path / "build" / "sweep.hypc")
+    cli.main(["compile", sweep_path, "-o", output_path])
+    cli.main([output_path, str(tmp_path / "build" / "configs")])
+    assert len(os.listdir(tmp_path / "build" / "configs")) == 4
+    with open(sweep_path, "a") as f:
+        f.write("a.z = 1\n")
+    with pytest.raises(ValueError, match="out of date"):
+        cli.main([output_path, str(tmp_path / "build" / "configs")])
+
+
+def test_rejects_jobs_below_one(sweep_path, tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        cli.main([sweep_path, str(tmp_path), "--jobs", "0"])
+    assert "--jobs must be at least 1" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        cli.main(["run", sweep_path, "-j", "0", "--", "true"])
+    assert "--jobs must be at least 1" in capsys.readouterr().err
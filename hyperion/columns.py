@@ -0,0 +1,184 @@
+import csv
+import itertools
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from hyperion import ast
+from hyperion import e2e
+from hyperion import rendering
+from hyperion import sweeps
+from hyperion import transforms
+
+
+literal_types = (bool, int, float, complex, type(None))
+
+
+def expr_to_value(expr):
+    if type(expr) in literal_types:
+        return expr
+    if type(expr) is ast.String:
+        return str(expr)
+    # References, macros, calls and containers are kept as the rendered text.
+    (text, _) = rendering.render(expr)
+    return text
+
+
+def values_to_array(values):
+    value_types = set(map(type, values))
+    if len(value_types) == 1 and value_types <= {bool, int, float, str}:
+        try:
+            return np.array(values)
+        except OverflowError:
+            # Integers that don't fit in int64.
+            pass
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def sweep_to_columns(bindings, batch_size=4096, dedupe=None, use_numpy=None):
+    # Returns a dict mapping every identifier whose value varies across the sweep
+    # to a column with its values in consecutive configs. Configs not binding an
+    # identifier get None.
+    (sweep, _) = e2e.parse_and_preprocess_sweep(bindings)
+    return _sweep_tree_to_columns(sweep, batch_size, dedupe, use_numpy)
+
+
+def _sweep_tree_to_columns(sweep, batch_size, dedupe, use_numpy):
+    if use_numpy is None:
+        use_numpy = np is not None
+
+    invariant = sweeps.invariant_bindings(sweep)
+    config_dicts = sweeps.generate_config_dicts(sweep, dedupe=dedupe)
+
+    # Preprocessing hoists the arguments of calls into bindings, also in the cells
+    # of external tables, so they can differ per config. We put them back, so the
+    # columns show the values as they're written, and don't list them separately.
+    hoisted_cache = {}
+
+    def is_hoisted(identifier):
+        if identifier not in hoisted_cache:
+            hoisted_cache[identifier] = transforms.is_hoisted_argument(identifier)
+        return hoisted_cache[identifier]
+
+    # The same expressions occur in many configs - convert each one once per set
+    # of hoisted arguments. The caches hold references to the expressions, so
+    # their ids stay valid even for the ones read from external tables, which the
+    # sweep doesn't hold.
+    arguments_cache = {}
+    value_cache = {}
+
+    def row_arguments(config_dict):
+        bindings = tuple(
+            (identifier, expr)
+            for (identifier, expr) in config_dict.items()
+            if is_hoisted(identifier)
+        )
+        key = tuple((identifier, id(expr)) for (identifier, expr) in bindings)
+        if key not in arguments_cache:
+            arguments_cache[key] = (bindings, transforms.hoisted_arguments(bindings))
+        return (key, arguments_cache[key][1])
+
+    def convert(expr, arguments_key, arguments):
+        key = (id(expr), arguments_key)
+        if key not in value_cache:
+            value_cache[key] = (
+                expr,
+                expr_to_value(transforms.restore_hoisted_calls(expr, arguments)),
+            )
+        (_, value) = value_cache[key]
+        return value
+
+    columns = {}
+    n_rows = 0
+    while True:
+        batch = list(itertools.islice(config_dicts, batch_size))
+        if not batch:
+            break
+
+        for config_dict in batch:
+            for identifier in config_dict:
+                if (
+                    identifier not in invariant
+                    and identifier not in columns
+                    and not is_hoisted(identifier)
+                ):
+                    # Fill the rows so far.
+                    columns[identifier] = [None] * n_rows
+
+        rows = [(config_dict, *row_arguments(config_dict)) for config_dict in batch]
+        for (identifier, column) in columns.items():
+            column.extend(
+                convert(config_dict[identifier], arguments_key, arguments)
+                if identifier in config_dict
+                else None
+                for (config_dict, arguments_key, arguments) in rows
+            )
+        n_rows += len(batch)
+
+    if use_numpy:
+        columns = {
+            identifier: values_to_array(column)
+            for (identifier, column) in columns.items()
+        }
+    return {
+        rendering.render(identifier): column for (identifier, column) in columns.items()
+    }
+
+
+def sweep_file_to_columns(sweep_file, batch_size=4096, dedupe=None, use_numpy=None):
+    (sweep, _) = e2e.load_preprocessed_sweep_file(sweep_file)
+    return _sweep_tree_to_columns(sweep, batch_size, dedupe, use_numpy)
+
+
+def columns_to_arrays(columns):
+    # Arrays of dtype object are pickled by np.savez, and np.load refuses to read
+    # them by default. Missing values are filled with NaN (numbers) or "" (strings)
+    # and marked in a boolean array "<identifier>:missing" - a name no identifier
+    # can have. Columns mixing strings with other values are rejected.
+    arrays = {}
+    for (identifier, column) in columns.items():
+        if isinstance(column, np.ndarray) and column.dtype != object:
+            arrays[identifier] = column
+            continue
+
+        missing = [value is None for value in column]
+        values = [value for value in column if value is not None]
+        value_types = set(map(type, values))
+        if value_types <= {bool, int, float}:
+            fill = np.nan
+        elif value_types == {str}:
+            fill = ""
+        else:
+            raise ValueError(
+                f"Column {identifier} mixes strings with other values, which .npz "
+                "files can't hold without pickling. Save the columns to .csv instead."
+            )
+        if any(missing):
+            column = [fill if value is None else value for value in column]
+            arrays[f"{identifier}:missing"] = np.array(missing)
+        try:
+            arrays[identifier] = np.array(list(column))
+        except OverflowError:
+            raise ValueError(
+                f"Column {identifier} has integers that don't fit in int64. Save the "
+                "columns to .csv instead."
+            )
+    return arrays
+
+
+def save_columns(columns, path):
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns.keys())
+            writer.writerows(zip(*columns.values()))
+    elif path.endswith(".npz"):
+        if np is None:
+            raise ValueError("Saving columns to .npz requires NumPy.")
+        np.savez(path, **columns_to_arrays(columns))
+    else:
+        raise ValueError(f"Unsupported column file format: {path}.")
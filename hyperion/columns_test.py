@@ -0,0 +1,99 @@
+import hypothesis as ht
+import pytest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from hyperion import columns
+from hyperion import e2e
+from hyperion import rendering
+from hyperion import testing
+
+
+sweep = """
+f.a = 1
+union:
+    f.b: [1, 2.5]
+    f.c: ['x', @g(y=%z, w=@h(v=-%z))]
+f.d: [1, 2]
+f.e: [%z * 2, 3]
+"""
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+@pytest.mark.parametrize("batch_size", [1, 3, 100])
+def test_sweep_to_columns(use_numpy, batch_size):
+    if use_numpy:
+        pytest.importorskip("numpy")
+
+    actual_columns = columns.sweep_to_columns(
+        sweep, batch_size=batch_size, use_numpy=use_numpy
+    )
+    assert {name: list(column) for (name, column) in actual_columns.items()} == {
+        "f.b": [1] * 4 + [2.5] * 4 + [None] * 8,
+        "f.c": [None] * 8 + ["x"] * 4 + ["@g(y=%z, w=@h(v=-%z))"] * 4,
+        "f.d": [1, 1, 2, 2] * 4,
+        "f.e": ["%z * 2", 3] * 8,
+    }
+
+
+@ht.settings(deadline=None, max_examples=20)
+@ht.given(testing.sweeps(with_imports=False, with_includes=False))
+def test_sweep_to_columns_has_a_row_per_config(sweep):
+    rendered_sweep = rendering.render(sweep)
+    with testing.try_with_eval():
+        n_configs = len(list(e2e.parse_sweep(rendered_sweep)))
+        sweep_columns = columns.sweep_to_columns(rendered_sweep, use_numpy=False)
+
+    for column in sweep_columns.values():
+        assert len(column) == n_configs
+
+
+@pytest.mark.skipif(np is None, reason="requires NumPy")
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_save_columns_to_npz_without_pickling(use_numpy, tmp_path):
+    path = str(tmp_path / "columns.npz")
+    columns.save_columns(
+        columns.sweep_to_columns(sweep.replace("%z * 2", "2.5"), use_numpy=use_numpy),
+        path,
+    )
+
+    with np.load(path) as npz:
+        assert sorted(npz.files) == [
+            "f.b",
+            "f.b:missing",
+            "f.c",
+            "f.c:missing",
+            "f.d",
+            "f.e",
+        ]
+        assert npz["f.b:missing"].tolist() == [False] * 8 + [True] * 8
+        assert npz["f.b"][:8].tolist() == [1] * 4 + [2.5] * 4
+        assert np.isnan(npz["f.b"][8:]).all()
+        assert (
+            npz["f.c"].tolist() == [""] * 8 + ["x"] * 4 + ["@g(y=%z, w=@h(v=-%z))"] * 4
+        )
+        assert npz["f.d"].tolist() == [1, 1, 2, 2] * 4
+        assert npz["f.e"].tolist() == [2.5, 3] * 8
+
+
+@pytest.mark.skipif(np is None, reason="requires NumPy")
+def test_save_columns_to_npz_rejects_mixed_columns(tmp_path):
+    with pytest.raises(ValueError, match="f.e mixes strings"):
+        columns.save_columns(
+            columns.sweep_to_columns(sweep), str(tmp_path / "columns.npz")
+        )
+
+
+def test_calls_in_external_tables_are_shown_as_written(tmp_path):
+    (tmp_path / "rows.csv").write_text("m\n@g(a=1)\n@g(a=-%z)\n")
+    sweep_path = tmp_path / "sweep.hyp"
+    sweep_path.write_text("table f.m from 'rows.csv'\nf.n: [1, 2]\n")
+
+    sweep_columns = columns.sweep_file_to_columns(str(sweep_path), use_numpy=False)
+    assert sweep_columns == {
+        "f.m": ["@g(a=1)", "@g(a=1)", "@g(a=-%z)", "@g(a=-%z)"],
+        "f.n": [1, 2, 1, 2],
+    }
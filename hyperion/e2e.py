@@ -1,33 +1,57 @@
+import functools
+import hashlib
 import io
 import os
 
 import gin as gin_module
 
+from hyperion import ast
+from hyperion import parallel
 from hyperion import parsing
 from hyperion import rendering
 from hyperion import runtime
+from hyperion import serialization
 from hyperion import sweeps
 from hyperion import transforms
 
 
-def _preprocess_bindings(bindings):
+def join_bindings(bindings):
     if type(bindings) in (list, tuple):
         bindings = "\n".join(bindings)
     return bindings
 
 
 def _hyperion_to_gin(text, is_config=True):
-    text = _preprocess_bindings(text)
+    text = join_bindings(text)
     tree = parsing.parse_config(text)
     if is_config:
         tree = transforms.preprocess_config(tree)
     return rendering.render(tree)
 
 
-def _hyperion_to_gin_open(path):
+# Converted files are cached, since every config of a sweep usually includes the
+# same files. The modification time and size in the key invalidate the entries of
+# files that changed.
+
+
+@functools.lru_cache(maxsize=128)
+def _convert_file(path, mtime_ns, size):
     with open(path, "r") as f:
-        bindings = _hyperion_to_gin(f.read())
-        return io.StringIO(bindings)
+        return _hyperion_to_gin(f.read())
+
+
+def _hyperion_to_gin_open(path):
+    stat = os.stat(path)
+    bindings = _convert_file(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    return io.StringIO(bindings)
+
+
+def include_cache_info():
+    return _convert_file.cache_info()
+
+
+def clear_include_cache():
+    _convert_file.cache_clear()
 
 
 def register(gin):
@@ -77,7 +101,24 @@ def parse_config_files_and_bindings(
     )
 
 
+def _needs_gin(expr):
+    # References and macros can only be resolved by Gin.
+    found = False
+
+    def visit_node(node):
+        nonlocal found
+        found = found or type(node) in (ast.Reference, ast.Call, ast.Macro)
+        return node
+
+    transforms.fold(visit_node, expr)
+    return found
+
+
 def parse_value(value):
+    expr = parsing.parse_expr(value)
+    if not _needs_gin(expr):
+        return transforms.evaluate(expr, resolve_macro=None)
+
     f = gin_module.external_configurable(lambda x: x, name="_f")
     binding = f"_f.x = {value}"
     gin_binding = _hyperion_to_gin(binding, is_config=True)
@@ -90,27 +131,231 @@ def parse_value(value):
 # =========================================
 
 
-def parse_sweep(bindings):
-    bindings = _preprocess_bindings(bindings)
-    sweep = parsing.parse_sweep(bindings)
+def _read_file(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def parse_and_preprocess_sweep(bindings):
+    bindings = join_bindings(bindings)
+    return _preprocess_sweep_tree(parsing.parse_sweep(bindings))
+
+
+def _preprocess_sweep_tree(sweep):
     sweep = transforms.preprocess_sweep(sweep)
-    (sweep, prelude) = transforms.remove_prelude(sweep)
-    for config in sweeps.generate_configs(sweep):
-        config = config._replace(statements=(prelude + config.statements))
-        yield rendering.render(config)
+    return transforms.remove_prelude(sweep)
+
+
+def _resolve_table_paths(sweep, directory):
+    # Relative paths of external tables in sweep files are relative to the
+    # directory of the file, not to the working directory.
+    def resolve_node(node):
+        if type(node) is ast.ExternalTable:
+            return node._replace(
+                source=ast.String(os.path.join(directory, str(node.source)))
+            )
+        if hasattr(node, "statements"):
+            return node._replace(statements=tuple(map(resolve_node, node.statements)))
+        return node
+
+    return resolve_node(sweep)
+
+
+def _parse_sweep_file_tree(sweep_file):
+    sweep = parsing.parse_sweep(_read_file(sweep_file))
+    return _resolve_table_paths(sweep, os.path.dirname(os.fspath(sweep_file)))
+
+
+def compile_sweep(bindings):
+    (sweep, prelude) = parse_and_preprocess_sweep(bindings)
+    return rendering.compile_sweep_template(sweep, prelude)
+
+
+def compile_sweep_file(sweep_file):
+    (sweep, prelude) = load_preprocessed_sweep_file(sweep_file)
+    return rendering.compile_sweep_template(sweep, prelude)
+
+
+def _render_template(template, dedupe, workers):
+    if workers is None:
+        return rendering.render_template(template, dedupe=dedupe)
+
+    if dedupe is not None:
+        raise ValueError("Deduplication requires generating configs sequentially.")
+    return parallel.render_template(template, workers)
 
 
-def parse_sweep_file(sweep_file):
-    with open(sweep_file, "r") as f:
-        yield from parse_sweep(f.read())
+def config_at(template, index):
+    # Random access to the configs of a compiled template. Without constraints in
+    # the sweep, the preceding configs aren't generated.
+    if index >= 0:
+        for line_dict in sweeps.slice_config_dicts(template.sweep, index, index + 1):
+            return rendering.render_line_dict(template, line_dict)
+    raise IndexError(f"Config index out of range: {index}.")
 
 
-def parse_sweep_files_and_bindings(sweep_files=(), bindings=""):
-    def read_file(path):
-        with open(path, "r") as f:
-            return f.read()
+def parse_sweep(bindings, dedupe=None, workers=None):
+    template = compile_sweep(bindings)
+    yield from _render_template(template, dedupe, workers)
 
-    bindings = "\n".join(
-        list(map(read_file, sweep_files)) + [_preprocess_bindings(bindings)]
+
+def parse_sweep_file(sweep_file, dedupe=None, workers=None):
+    template = compile_sweep_file(sweep_file)
+    yield from _render_template(template, dedupe, workers)
+
+
+def parse_sweep_files_and_bindings(
+    sweep_files=(), bindings="", dedupe=None, workers=None
+):
+    sweep_files = list(sweep_files)
+    if any(map(_is_compiled_sweep_file, sweep_files)):
+        # Compiled sweeps are already preprocessed, so there's nothing to merge
+        # them with.
+        if len(sweep_files) > 1 or join_bindings(bindings):
+            raise ValueError(
+                "Compiled sweeps can't be combined with other sweep files or bindings."
+            )
+        yield from parse_sweep_file(sweep_files[0], dedupe=dedupe, workers=workers)
+        return
+
+    # The files are parsed separately, to resolve the paths of their tables.
+    statements = tuple(
+        statement
+        for sweep_file in sweep_files
+        for statement in _parse_sweep_file_tree(sweep_file).statements
     )
-    yield from parse_sweep(bindings)
+    statements += parsing.parse_sweep(join_bindings(bindings)).statements
+    (sweep, prelude) = _preprocess_sweep_tree(ast.Sweep(statements=statements))
+    template = rendering.compile_sweep_template(sweep, prelude)
+    yield from _render_template(template, dedupe, workers)
+
+
+# Compiled sweeps:
+# ================
+#
+# Tools generating the configs of the same big sweep can share it preprocessed, in
+# a .hypc file: a magic string, a hash of the source and the serialized path of
+# the source file, sweep and prelude. The sweep file functions accept them in
+# place of sweep files. The hash tells if a compiled sweep is stale. It's checked
+# when loading, against the given source or the source file, if it still exists.
+#
+# Relative paths of external tables are made absolute when compiling, so the
+# compiled sweep can be put anywhere.
+
+compiled_sweep_extension = ".hypc"
+compiled_sweep_magic = b"HYPSWP\n"
+_source_hash_size = 16
+
+
+def source_hash(bindings):
+    text = join_bindings(bindings)
+    return hashlib.blake2b(text.encode(), digest_size=_source_hash_size).digest()
+
+
+def _write_compiled_sweep(path, bindings, sweep, source_file):
+    (sweep, prelude) = _preprocess_sweep_tree(sweep)
+    data = serialization.dumps((source_file, sweep, prelude))
+    with open(path, "wb") as f:
+        f.write(compiled_sweep_magic)
+        f.write(source_hash(bindings))
+        f.write(data)
+
+
+def save_compiled_sweep(bindings, path):
+    # Table paths are relative to the working directory, like in parse_sweep.
+    bindings = join_bindings(bindings)
+    sweep = _resolve_table_paths(parsing.parse_sweep(bindings), os.getcwd())
+    _write_compiled_sweep(path, bindings, sweep, source_file=None)
+
+
+def save_compiled_sweep_file(sweep_file, path):
+    bindings = _read_file(sweep_file)
+    sweep = _resolve_table_paths(
+        parsing.parse_sweep(bindings), os.path.dirname(os.path.abspath(sweep_file))
+    )
+    _write_compiled_sweep(path, bindings, sweep, os.path.abspath(sweep_file))
+
+
+def _read_compiled_sweep(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(compiled_sweep_magic):
+        raise ValueError(f"Not a compiled sweep: {path}.")
+    start = len(compiled_sweep_magic) + _source_hash_size
+    return (data[len(compiled_sweep_magic) : start], data[start:])
+
+
+def load_compiled_sweep(path, source=None):
+    # Returns the preprocessed sweep and prelude. source are the bindings the sweep
+    # was compiled from, by default read from the source file if there is one.
+    (digest, data) = _read_compiled_sweep(path)
+    (source_file, sweep, prelude) = serialization.loads(data)
+    if source is None and source_file is not None and os.path.exists(source_file):
+        source = _read_file(source_file)
+    if source is not None and digest != source_hash(source):
+        raise ValueError(
+            f"Compiled sweep {path} is out of date with its source, compile it again."
+        )
+    return (sweep, prelude)
+
+
+def compiled_sweep_source_hash(path):
+    (digest, _) = _read_compiled_sweep(path)
+    return digest
+
+
+def _is_compiled_sweep_file(sweep_file):
+    return os.fspath(sweep_file).endswith(compiled_sweep_extension)
+
+
+def load_preprocessed_sweep_file(sweep_file):
+    if _is_compiled_sweep_file(sweep_file):
+        return load_compiled_sweep(sweep_file)
+    return _preprocess_sweep_tree(_parse_sweep_file_tree(sweep_file))
+
+
+# Delta-encoded sweeps:
+# =====================
+#
+# The bindings that are the same in every config of a sweep go into one shared
+# base config, along with the prelude. Every config only gets the bindings that
+# vary.
+
+
+def _compile_delta(sweep, prelude):
+    invariant = sweeps.invariant_bindings(sweep)
+    base = ast.Config(
+        statements=(
+            prelude
+            + tuple(
+                ast.Binding(identifier=identifier, expr=expr)
+                for (identifier, expr) in invariant.items()
+            )
+        )
+    )
+
+    template = rendering.compile_sweep_template(sweep, prelude=(), exclude=invariant)
+    return (rendering.render(base), template)
+
+
+def compile_sweep_delta(bindings):
+    return _compile_delta(*parse_and_preprocess_sweep(bindings))
+
+
+def compile_sweep_file_delta(sweep_file):
+    return _compile_delta(*load_preprocessed_sweep_file(sweep_file))
+
+
+def parse_sweep_delta(bindings, dedupe=None, workers=None):
+    (base, template) = compile_sweep_delta(bindings)
+    return (base, _render_template(template, dedupe, workers))
+
+
+def parse_sweep_file_delta(sweep_file, dedupe=None, workers=None):
+    (base, template) = compile_sweep_file_delta(sweep_file)
+    return (base, _render_template(template, dedupe, workers))
+
+
+def parse_delta_config_files(base_file, delta_file):
+    parse_config_file(base_file)
+    return parse_config_file(delta_file)
@@ -310,3 +310,148 @@ def test_parse_value_evaluates_exprs(expr):
         testing.assert_exception_equal(actual_exc, expected_exc)
     else:
         assert not expected_exc and actual_value == expected_value
+
+
+def test_parse_config_file_caches_converted_files(tmp_path):
+    path = tmp_path / "config.gin"
+    path.write_text("f.x = 1 + 1")
+    e2e.clear_include_cache()
+    with testing.gin_sandbox() as gin:
+        runtime.register(gin)
+        e2e.register(gin)
+        f = gin.external_configurable(lambda x: x, name="f")
+        e2e.parse_config_file(str(path))
+        e2e.parse_config_file(str(path))
+        assert f() == 2
+        assert e2e.include_cache_info().hits == 1
+
+        # Within the resolution of the modification time, only the size tells the
+        # versions apart.
+        path.write_text("f.x = 20 + 1")
+        e2e.parse_config_file(str(path))
+        assert f() == 21
+        assert e2e.include_cache_info().misses == 2
+
+
+def test_parse_value_evaluates_without_gin():
+    with testing.gin_sandbox() as gin:
+        e2e.register(gin)
+        assert e2e.parse_value("[1, 'a' * 2] + [1 / 2]") == [1, "aa", 0.5]
+        assert gin.config_str() == ""
+
+
+def test_parse_value_resolves_macros_using_gin():
+    with testing.gin_sandbox() as gin:
+        e2e.register(gin)
+        runtime.register(gin)
+        gin.parse_config("m = 3")
+        assert e2e.parse_value("%m + 1") == 4
+
+
+# Parses every config back, so it needs more time.
+@ht.settings(**{**settings, "deadline": None})
+@ht.given(sweeps_without_prelude)
+def test_parse_sweep_delta_adds_up_to_full_configs(sweep):
+    rendered_sweep = rendering.render(sweep)
+    with testing.try_with_eval():
+        full_configs = list(e2e.parse_sweep(rendered_sweep))
+        (base, deltas) = e2e.parse_sweep_delta(rendered_sweep)
+        deltas = list(deltas)
+
+    assert len(deltas) == len(full_configs)
+    base_statements = parsing.parse_config(base).statements
+    for (full_config, delta) in zip(full_configs, deltas):
+        delta_statements = parsing.parse_config(delta).statements
+        assert set(base_statements) | set(delta_statements) == set(
+            parsing.parse_config(full_config).statements
+        )
+
+
+def test_parse_delta_config_files_applies_base_and_delta(tmp_path):
+    (base, deltas) = e2e.parse_sweep_delta(["f.x = 1", "f.y: [2, 3]"])
+    base_path = tmp_path / "base.gin"
+    base_path.write_text(base)
+    for (delta, expected_y) in zip(deltas, (2, 3)):
+        delta_path = tmp_path / "delta.gin"
+        delta_path.write_text(delta)
+        with testing.gin_sandbox() as gin:
+            e2e.register(gin)
+            f = gin.external_configurable(lambda x, y: (x, y), name="f")
+            e2e.parse_delta_config_files(str(base_path), str(delta_path))
+            assert f() == (1, expected_y)
+
+
+def test_parse_sweep_filters_configs_by_constraints():
+    configs = e2e.parse_sweep(
+        [
+            "d_model: [256, 512, 1024]",
+            "n_layers: [4, 8, 16]",
+            "where %d_model * %n_layers <= 4096",
+        ]
+    )
+    assert list(configs) == [
+        "d_model = 256\nn_layers = 4",
+        "d_model = 256\nn_layers = 8",
+        "d_model = 256\nn_layers = 16",
+        "d_model = 512\nn_layers = 4",
+        "d_model = 512\nn_layers = 8",
+        "d_model = 1024\nn_layers = 4",
+    ]
+
+
+def test_parse_sweep_with_workers_equals_sequential():
+    sweep = ["f.x: [1, 2, 3]", "f.y: [4, 5]", "f.z = %x"]
+    assert list(e2e.parse_sweep(sweep, workers=2)) == list(e2e.parse_sweep(sweep))
+
+
+@ht.settings(**{**settings, "deadline": None})
+@ht.given(sweeps_without_prelude)
+def test_compiled_sweep_file_generates_the_same_configs(tmpdir_factory, sweep):
+    rendered_sweep = rendering.render(sweep)
+    path = str(tmpdir_factory.mktemp("tmp").join("sweep.hypc"))
+    with testing.try_with_eval():
+        e2e.save_compiled_sweep(rendered_sweep, path)
+        assert list(e2e.parse_sweep_file(path)) == list(e2e.parse_sweep(rendered_sweep))
+    assert e2e.compiled_sweep_source_hash(path) == e2e.source_hash(rendered_sweep)
+
+
+def test_compiled_sweep_keeps_prelude_and_constraints(tmp_path):
+    sweep = "import os\nm: [1, 2, 3]\nf.x = @g(y=%m)\nwhere %m > 1"
+    path = str(tmp_path / "sweep.hypc")
+    e2e.save_compiled_sweep(sweep, path)
+    assert list(e2e.parse_sweep_files_and_bindings([path])) == list(
+        e2e.parse_sweep(sweep)
+    )
+    with pytest.raises(ValueError, match="can't be combined"):
+        list(e2e.parse_sweep_files_and_bindings([path], "m = 1"))
+
+    not_compiled_path = tmp_path / "sweep_source.hypc"
+    not_compiled_path.write_text(sweep)
+    with pytest.raises(ValueError, match="Not a compiled sweep"):
+        e2e.load_compiled_sweep(str(not_compiled_path))
+
+
+def test_stale_compiled_sweeps_are_rejected(tmp_path):
+    source_path = tmp_path / "sweep.hyp"
+    source_path.write_text("f.x: [1, 2]")
+    (tmp_path / "build").mkdir()
+    path = str(tmp_path / "build" / "sweep.hypc")
+    e2e.save_compiled_sweep_file(source_path, path)
+    assert len(list(e2e.parse_sweep_file(path))) == 2
+
+    source_path.write_text("f.x: [1, 2, 3]")
+    with pytest.raises(ValueError, match="out of date"):
+        list(e2e.parse_sweep_file(path))
+    with pytest.raises(ValueError, match="out of date"):
+        e2e.load_compiled_sweep(path, source="f.x: [1]")
+
+
+@pytest.mark.parametrize("where", ["", "\nwhere %x != 2"])
+def test_config_at_equals_generated_configs(where):
+    sweep = "x: [1, 2, 3]\nunion:\n    y: [4, 5]\n    z: [6]" + where
+    template = e2e.compile_sweep(sweep)
+    configs = list(e2e.parse_sweep(sweep))
+    assert [e2e.config_at(template, index) for index in range(len(configs))] == configs
+    for index in (-1, len(configs)):
+        with pytest.raises(IndexError):
+            e2e.config_at(template, index)
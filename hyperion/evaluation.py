@@ -0,0 +1,122 @@
+import collections
+
+from hyperion import ast
+from hyperion import e2e
+from hyperion import parsing
+from hyperion import rendering
+from hyperion import sweeps
+from hyperion import transforms
+
+
+# Static evaluation of configs into Python values, without Gin. Works both on
+# configs as written and on preprocessed ones, where expressions are calls to the
+# runtime configurables with the arguments hoisted into scoped bindings.
+
+# References to configurables can't be evaluated without Gin, so we represent them
+# symbolically. evaluated is True for @f() and False for @f. arguments are the
+# evaluated (name, value) pairs given in the call, if any.
+SymbolicReference = collections.namedtuple(
+    "SymbolicReference", ["identifier", "evaluated", "arguments"]
+)
+
+_runtime_functions = {
+    "_u": lambda o, v: transforms.eval_unary_op(operator=o, operand=v),
+    "_b": lambda l, o, r: transforms.eval_binary_op(left=l, operator=o, right=r),
+}
+_runtime_arguments = {"_u": ("o", "v"), "_b": ("l", "o", "r")}
+
+
+def is_runtime_identifier(identifier):
+    return identifier.namespace.path[:1] == ("_h",)
+
+
+def evaluate_config_tree(config):
+    config = transforms.flatten_withs(config)
+    # Later bindings override the earlier ones, like in Gin.
+    exprs = {
+        statement.identifier: statement.expr
+        for statement in config.statements
+        if type(statement) is ast.Binding
+    }
+    values = {}
+    in_progress = set()
+
+    def value_of(identifier):
+        if identifier not in values:
+            if identifier in in_progress:
+                raise ValueError(
+                    f"Circular definition of {rendering.render(identifier)}."
+                )
+            in_progress.add(identifier)
+            values[identifier] = transforms.evaluate(
+                exprs[identifier], resolve_macro, eval_reference
+            )
+            in_progress.remove(identifier)
+        return values[identifier]
+
+    def resolve_macro(name):
+        # Returns the value, which evaluates to itself.
+        identifier = transforms.make_identifier(namespace_path=(), name=name)
+        if identifier not in exprs:
+            raise ValueError(f"Unbound macro %{name}.")
+        return value_of(identifier)
+
+    def eval_call(node):
+        identifier = node.identifier
+        if is_runtime_identifier(identifier) and identifier.name in _runtime_functions:
+            if node.arguments:
+                arguments = dict(node.arguments)
+            else:
+                # Arguments hoisted by transforms.calls_to_evaluated_references.
+                arguments = {
+                    name: value_of(transforms.append_name(name, identifier))
+                    for name in _runtime_arguments[identifier.name]
+                }
+            return _runtime_functions[identifier.name](**arguments)
+
+        return SymbolicReference(
+            identifier=rendering.render(identifier),
+            evaluated=True,
+            arguments=tuple(node.arguments),
+        )
+
+    def eval_reference(node):
+        if type(node) is ast.Call:
+            return eval_call(node)
+        return SymbolicReference(
+            identifier=rendering.render(node.identifier),
+            evaluated=False,
+            arguments=(),
+        )
+
+    return {
+        rendering.render(identifier): value_of(identifier)
+        for identifier in exprs
+        if not is_runtime_identifier(identifier)
+    }
+
+
+def evaluate_config(config):
+    # config can be a config in text or an ast.Config. Returns a dict from the
+    # rendered identifiers to the values.
+    if type(config) is not ast.Config:
+        config = parsing.parse_config(e2e.join_bindings(config))
+    return evaluate_config_tree(config)
+
+
+def evaluate_sweep(bindings, dedupe=None):
+    # Yields the evaluated configs of a sweep. Skips rendering and parsing the
+    # configs back, by evaluating the generated trees directly. The arguments
+    # hoisted by preprocessing are put back into the calls, so the values are the
+    # same as from evaluate_config of the configs as written.
+    (sweep, _) = e2e.parse_and_preprocess_sweep(bindings)
+    for config_dict in sweeps.generate_config_dicts(sweep, dedupe=dedupe):
+        config = ast.Config(
+            statements=tuple(
+                ast.Binding(identifier=identifier, expr=expr)
+                for (identifier, expr) in transforms.restore_hoisted_bindings(
+                    config_dict.items()
+                )
+            )
+        )
+        yield evaluate_config_tree(config)
@@ -0,0 +1,66 @@
+import hypothesis as ht
+
+from hyperion import ast
+from hyperion import evaluation
+from hyperion import rendering
+from hyperion import testing
+from hyperion import transforms
+
+
+@ht.settings(deadline=None)
+@ht.given(testing.exprs(for_eval=True))
+def test_evaluate_config_equals_partial_eval(expr):
+    expected_exc = None
+    try:
+        expected_value = transforms.partial_eval(expr)
+    except Exception as e:
+        if type(e) in testing.allowed_eval_exceptions:
+            expected_exc = e
+        else:
+            raise
+
+    identifier = transforms.make_identifier(namespace_path=("result",), name="value")
+    config = ast.Config(statements=(ast.Binding(identifier=identifier, expr=expr),))
+    preprocessed_config = transforms.preprocess_config(config, with_partial_eval=False)
+    for tree in (config, preprocessed_config):
+        try:
+            actual_values = evaluation.evaluate_config(rendering.render(tree))
+        except Exception as actual_exc:
+            testing.assert_exception_equal(actual_exc, expected_exc)
+        else:
+            assert not expected_exc
+            assert actual_values == {"result.value": expected_value}
+
+
+def test_evaluate_config_resolves_macros_and_keeps_references():
+    config = "\n".join(
+        [
+            "m = 2",
+            "with f:",
+            "    x = [%m, 'a'] * %m",
+            "    y = @g",
+            "    z = @s/h(x=%m + 1)",
+        ]
+    )
+    assert evaluation.evaluate_config(config) == {
+        "m": 2,
+        "f.x": [2, "a", 2, "a"],
+        "f.y": evaluation.SymbolicReference("g", evaluated=False, arguments=()),
+        "f.z": evaluation.SymbolicReference(
+            "s/h", evaluated=True, arguments=(("x", 3),)
+        ),
+    }
+
+
+def test_evaluate_sweep_evaluates_every_config():
+    sweep = "m = 3\nf.x: [1, 2]\nf.y = %m * 2 - 1\n"
+    assert list(evaluation.evaluate_sweep(sweep)) == [
+        {"m": 3, "f.x": 1, "f.y": 5},
+        {"m": 3, "f.x": 2, "f.y": 5},
+    ]
+
+
+def test_evaluate_sweep_puts_hoisted_arguments_back():
+    sweep = "x = 3\nf.y = @g(a=%x, b=@h(c=-%x))\nf.z: [1, 2]"
+    config = "x = 3\nf.y = @g(a=%x, b=@h(c=-%x))\nf.z = 1"
+    assert next(evaluation.evaluate_sweep(sweep)) == evaluation.evaluate_config(config)
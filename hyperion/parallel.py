@@ -0,0 +1,108 @@
+import collections
+import itertools
+import multiprocessing
+
+from hyperion import rendering
+from hyperion import sweeps
+
+
+default_chunk_size = 256
+
+
+# Every worker process receives the compiled sweep template once, in the
+# initializer, and then renders chunks of configs. A chunk is a pair (start,
+# work): either the stop index of a range of config indices, or the line dicts of
+# the configs.
+#
+# Sweeps with constraints can't be indexed, as we don't know how many configs
+# the preceding nodes generate without generating them. For these, the parent
+# generates the line dicts and the workers only render and write them.
+_template = None
+
+
+def _init_worker(template):
+    global _template
+    _template = template
+
+
+def _render_chunk(chunk):
+    (start, work) = chunk
+    if type(work) is int:
+        line_dicts = sweeps.slice_config_dicts(_template.sweep, start, work)
+    else:
+        line_dicts = work
+    return [
+        rendering.render_line_dict(_template, line_dict) for line_dict in line_dicts
+    ]
+
+
+def _write_chunk(args):
+    (chunk, (path_prefix, path_suffix)) = args
+    configs = _render_chunk(chunk)
+    (start, _) = chunk
+    for (index, config) in enumerate(configs, start=start):
+        with open(f"{path_prefix}{index}{path_suffix}", "w") as f:
+            f.write(config)
+    return len(configs)
+
+
+def _is_indexable(template):
+    return sweeps.config_counts(template.sweep)[id(template.sweep)] is not None
+
+
+def _chunks(template, chunk_size):
+    if _is_indexable(template):
+        n_configs = sweeps.config_counts(template.sweep)[id(template.sweep)]
+        for start in range(0, n_configs, chunk_size):
+            yield (start, min(start + chunk_size, n_configs))
+        return
+
+    line_dicts = sweeps.generate_config_dicts(template.sweep)
+    for start in itertools.count(step=chunk_size):
+        # The lines of external tables are str subclasses, which we send as str.
+        chunk = [
+            {identifier: str(line) for (identifier, line) in line_dict.items()}
+            for line_dict in itertools.islice(line_dicts, chunk_size)
+        ]
+        if not chunk:
+            return
+        yield (start, chunk)
+
+
+def _make_pool(template, workers):
+    if not _is_indexable(template):
+        # The workers don't generate, so they don't need the sweep and its
+        # constraints.
+        template = template._replace(sweep=None)
+    return multiprocessing.Pool(workers, initializer=_init_worker, initargs=(template,))
+
+
+def _imap(pool, fn, tasks, workers):
+    # Like pool.imap, but submits at most two tasks per worker ahead of the
+    # consumer, so the chunks generated by the parent don't pile up in memory.
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.apply_async(fn, (task,)))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def render_template(template, workers, chunk_size=default_chunk_size):
+    # Renders the configs in parallel and yields them in order.
+    chunks = _chunks(template, chunk_size)
+    with _make_pool(template, workers) as pool:
+        for configs in _imap(pool, _render_chunk, chunks, workers):
+            yield from configs
+
+
+def write_template(
+    template, workers, path_prefix, path_suffix, chunk_size=default_chunk_size
+):
+    # Renders the configs in parallel and writes them to files named
+    # {path_prefix}{index}{path_suffix}. Returns the number of configs.
+    chunks = _chunks(template, chunk_size)
+    tasks = ((chunk, (path_prefix, path_suffix)) for chunk in chunks)
+    with _make_pool(template, workers) as pool:
+        return sum(_imap(pool, _write_chunk, tasks, workers))
@@ -0,0 +1,56 @@
+import hypothesis as ht
+from hypothesis import strategies as st
+
+from hyperion import e2e
+from hyperion import parallel
+from hyperion import rendering
+
+
+sweep = """
+d_model: [256, 512, 1024]
+union:
+    n_layers: [4, 8, 16]
+    n_heads = 4
+f.x: [1, 2, 3]
+"""
+
+
+@ht.settings(deadline=None, max_examples=10)
+@ht.given(st.integers(min_value=1, max_value=3), st.integers(min_value=1, max_value=7))
+def test_render_template_equals_sequential(workers, chunk_size):
+    template = e2e.compile_sweep(sweep)
+    expected_configs = list(rendering.render_template(template))
+    actual_configs = list(
+        parallel.render_template(template, workers, chunk_size=chunk_size)
+    )
+    assert actual_configs == expected_configs
+
+
+def test_render_template_supports_constraints():
+    template = e2e.compile_sweep(sweep + "where %d_model * %n_layers <= 4096\n")
+    expected_configs = list(rendering.render_template(template))
+    assert list(parallel.render_template(template, 2, chunk_size=2)) == (
+        expected_configs
+    )
+
+
+def test_write_template_supports_constraints(tmp_path):
+    template = e2e.compile_sweep(sweep + "where %d_model * %n_layers <= 4096\n")
+    n_configs = parallel.write_template(
+        template, 2, path_prefix=str(tmp_path / "config_"), path_suffix=".gin"
+    )
+    expected_configs = list(rendering.render_template(template))
+    assert n_configs == len(expected_configs)
+    for (i, config) in enumerate(expected_configs):
+        assert (tmp_path / f"config_{i}.gin").read_text() == config
+
+
+def test_write_template_writes_all_configs(tmp_path):
+    template = e2e.compile_sweep(sweep)
+    n_configs = parallel.write_template(
+        template, 2, path_prefix=str(tmp_path / "config_"), path_suffix=".gin"
+    )
+    expected_configs = list(rendering.render_template(template))
+    assert n_configs == len(expected_configs)
+    for (i, config) in enumerate(expected_configs):
+        assert (tmp_path / f"config_{i}.gin").read_text() == config
@@ -177,6 +177,10 @@ class SweepTransformer(lark.Transformer):
     table = lambda self, items: ast.Table(header=items[0], rows=tuple(items[1:]))
     table_header = lambda self, identifiers: ast.Header(tuple(identifiers))
     table_row = lambda self, exprs: ast.Row(tuple(exprs))
+    where = lambda self, items: ast.Where(expr=items[1])
+    external_table = lambda self, items: ast.ExternalTable(
+        header=items[0], source=ast.String.from_tokens(items[1:])
+    )
 
 
 # Copy the ConfigTransformer visitors into SweepTransformer with the config__ prefix.
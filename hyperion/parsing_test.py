@@ -41,3 +41,33 @@ def test_configs_are_sweeps(config):
     ht.note(f"Rendered config: {text}")
     parsed_sweep = parsing.parse_sweep(text)
     assert parsed_sweep.statements == config.statements
+
+
+@ht.settings(**settings)
+@ht.given(
+    testing.sweeps(
+        leaf_sts=[
+            testing.bindings(safe=False),
+            testing.alls(),
+            testing.tables(),
+            testing.wheres(),
+        ]
+    )
+)
+def test_parse_sweep_inverses_render_with_constraints(original_sweep):
+    text = rendering.render(original_sweep)
+    ht.note(f"Rendered sweep: {text}")
+    parsed_sweep = parsing.parse_sweep(text)
+    assert parsed_sweep == original_sweep
+
+
+def test_where_is_only_a_keyword_at_the_start_of_a_statement():
+    sweep = parsing.parse_sweep(
+        "f.where = 1\nmodel.where: [1, 2]\nwith where:\n    a = %where\n"
+        "where %where > 1"
+    )
+    (binding, all_, with_, where) = sweep.statements
+    assert binding.identifier.name == "where"
+    assert all_.identifier.name == "where"
+    assert with_.namespace.path == ("where",)
+    assert where.expr.left.name == "where"
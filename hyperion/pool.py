@@ -0,0 +1,205 @@
+import asyncio
+import importlib
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import traceback
+
+from hyperion import e2e
+from hyperion import stream
+
+
+# Warm worker pool: a server process imports Hyperion and the user's module once,
+# and then forks a child for every config. The child binds the config in Gin and
+# calls the entry point, so runs only pay for the fork instead of starting Python
+# and importing everything again. Requires os.fork, so it's POSIX-only.
+#
+# The parent sends requests to the server's stdin and receives the exit codes of
+# the runs from its stdout. Both are JSON objects in the length-prefixed framing
+# of hyperion.stream. The server redirects its own stdout to stderr, so output of
+# the user's module doesn't get mixed with the results. Children write their
+# output to the logs of their runs.
+
+_length_size = struct.calcsize(stream.length_format)
+
+
+def encode_message(message):
+    return stream.encode_length(None, json.dumps(message))
+
+
+def load_entry_point(spec):
+    # spec is "module:function", with an optional dotted path after the colon.
+    (module_name, _, name) = spec.partition(":")
+    if not module_name or not name:
+        raise ValueError(f"Expected an entry point as module:function, got {spec}.")
+    entry_point = importlib.import_module(module_name)
+    for attribute in name.split("."):
+        entry_point = getattr(entry_point, attribute)
+    return entry_point
+
+
+def _exit_code(exit):
+    if exit.code is None:
+        return 0
+    if type(exit.code) is int:
+        return exit.code
+    print(exit.code, file=sys.stderr)
+    return 1
+
+
+def _run_child(entry_point, config, log_path):
+    # Runs in the forked child. Never returns.
+    code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        os.close(fd)
+        e2e.gin_module.parse_config(config)
+        entry_point()
+        code = 0
+    except SystemExit as exit:
+        code = _exit_code(exit)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def serve(spec):
+    # Main loop of the server process. Redirects stdout before importing the
+    # user's module, which may print.
+    results = os.fdopen(os.dup(1), "wb", buffering=0)
+    os.dup2(2, 1)
+    entry_point = load_entry_point(spec)
+    requests = stream.decode_length(os.fdopen(0, "rb", buffering=0))
+
+    # Wake up the loop when a child exits.
+    (wakeup_read, wakeup_write) = os.pipe()
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    children = {}
+
+    def terminate(signum, frame):
+        # Don't leave the runs behind.
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        os._exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, terminate)
+    open_requests = True
+    while open_requests or children:
+        (ready, _, _) = select.select(
+            [0, wakeup_read] if open_requests else [wakeup_read], [], []
+        )
+        if wakeup_read in ready:
+            os.read(wakeup_read, 4096)
+        if 0 in ready:
+            request = next(requests, None)
+            if request is None:
+                open_requests = False
+            else:
+                request = json.loads(request)
+                pid = os.fork()
+                if pid == 0:
+                    results.close()
+                    _run_child(entry_point, request["config"], request["log_path"])
+                children[pid] = request["index"]
+
+        while children:
+            (pid, status) = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            index = children.pop(pid)
+            returncode = os.waitstatus_to_exitcode(status)
+            results.write(encode_message({"index": index, "returncode": returncode}))
+
+
+class WarmPool:
+    # Client of the server process, for asyncio code. Use as an async context
+    # manager, and call run for every config, with at most as many concurrent runs
+    # as the machine can handle.
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._process = None
+        self._pending = {}
+        self._reader = None
+
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-c",
+            "import sys; from hyperion import pool; pool.serve(sys.argv[1])",
+            self.spec,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        self._reader = asyncio.create_task(self._read_results())
+
+    async def _read_results(self):
+        try:
+            while True:
+                header = await self._process.stdout.readexactly(_length_size)
+                (length,) = struct.unpack(stream.length_format, header)
+                result = json.loads(await self._process.stdout.readexactly(length))
+                future = self._pending.pop(result["index"])
+                if not future.done():
+                    future.set_result(result["returncode"])
+        except asyncio.IncompleteReadError:
+            pass
+
+        # The server exited - fail the runs still waiting for it.
+        returncode = await self._process.wait()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(
+                    RuntimeError(f"The worker pool exited with code {returncode}.")
+                )
+        self._pending.clear()
+
+    async def run(self, index, config, log_path):
+        # Returns the exit code of the run.
+        if self._reader.done():
+            raise RuntimeError("The worker pool isn't running.")
+        future = asyncio.get_running_loop().create_future()
+        self._pending[index] = future
+        try:
+            self._process.stdin.write(
+                encode_message({"index": index, "config": config, "log_path": log_path})
+            )
+            await self._process.stdin.drain()
+        except ConnectionError:
+            # The server exited, and the reader fails the future.
+            pass
+        return await future
+
+    async def close(self):
+        # Waits for the runs in progress and stops the server.
+        if self._process.stdin.can_write_eof():
+            self._process.stdin.write_eof()
+        await self._reader
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if exc_info[0] is not None and self._process.returncode is None:
+            self._process.terminate()
+        await self.close()
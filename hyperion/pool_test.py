@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from hyperion import pool
+
+
+trainer = """
+import sys
+
+import gin
+
+with open("imports.txt", "a") as f:
+    f.write("imported\\n")
+
+
+@gin.configurable
+def train(a, exit=None):
+    print("train", a)
+    if exit == "raise":
+        raise ValueError("boom")
+    if exit is not None:
+        sys.exit(exit)
+
+
+def main():
+    train()
+"""
+
+
+@pytest.fixture
+def trainer_dir(tmp_path, monkeypatch):
+    # The server imports the module from the working directory.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "pool_test_trainer", raising=False)
+    (tmp_path / "pool_test_trainer.py").write_text(trainer)
+    return tmp_path
+
+
+def run_configs(spec, configs):
+    async def run_all():
+        async with pool.WarmPool(spec) as warm_pool:
+            return await asyncio.gather(
+                *(
+                    warm_pool.run(index, config, f"{index}.log")
+                    for (index, config) in enumerate(configs)
+                )
+            )
+
+    return asyncio.run(run_all())
+
+
+def test_runs_configs_in_forked_children(trainer_dir):
+    configs = [
+        "train.a = 1",
+        "train.a = 2\ntrain.exit = 'raise'",
+        "train.a = 3\ntrain.exit = 3",
+        "train.a = 4\ntrain.exit = 'message'",
+        "train.a = 5\ntrain.exit = 0",
+    ]
+    assert run_configs("pool_test_trainer:main", configs) == [0, 1, 3, 1, 0]
+    for (index, config) in enumerate(configs):
+        log = (trainer_dir / f"{index}.log").read_text()
+        assert log.startswith(f"train {index + 1}\n")
+    assert "ValueError: boom" in (trainer_dir / "1.log").read_text()
+    assert (trainer_dir / "3.log").read_text().endswith("message\n")
+    # Imported once, by the server.
+    assert (trainer_dir / "imports.txt").read_text() == "imported\n"
+
+
+def test_fails_the_runs_if_the_server_exits(trainer_dir):
+    with pytest.raises(RuntimeError, match="worker pool exited"):
+        run_configs("pool_test_trainer:missing", ["train.a = 1"])
+
+
+def test_load_entry_point():
+    assert pool.load_entry_point("os.path:join") is os.path.join
+    with pytest.raises(ValueError, match="module:function"):
+        pool.load_entry_point("os.path")
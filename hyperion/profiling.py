@@ -0,0 +1,348 @@
+import collections
+import contextlib
+import functools
+import importlib
+import inspect
+import json
+import time
+import tracemalloc
+
+
+# Profiling of the config generation pipeline. While a profile is active, the
+# functions of every stage below are replaced by timed wrappers, and
+# transforms.fold by one counting the visited nodes. Nothing is patched otherwise,
+# so profiling has no overhead when disabled.
+#
+# Stages can be nested, e.g. the transforms passes run inside
+# transforms.preprocess_sweep. Every stage records its total time and its self
+# time, excluding the nested stages. Generators are timed while they produce the
+# items, not while the consumer processes them. The hits and misses of the caches
+# are recorded as well.
+#
+# With memory=True, allocations are traced with tracemalloc, and every stage also
+# records its peak allocation above the memory in use when it started, and the
+# memory it retained when it finished. The generators of the sweep nodes are then
+# instrumented too, so the memory of e.g. the materialized parts of products is
+# attributed to the node types. Tracing allocations slows everything down a lot,
+# so the times aren't representative then.
+#
+# As profiling patches the module globals, it isn't thread-safe: the stages called
+# from other threads during a profile are recorded too, and profiles can't run
+# concurrently. Worker processes, e.g. of parallel.write_template, aren't
+# profiled - only the time spent waiting for them and the configs they report.
+
+stages = (
+    ("parsing", "parse_config"),
+    ("parsing", "parse_sweep"),
+    ("parsing", "parse_expr"),
+    ("transforms", "preprocess_config"),
+    ("transforms", "preprocess_sweep"),
+    ("transforms", "flatten_withs"),
+    ("transforms", "partial_eval"),
+    ("transforms", "expressions_to_calls"),
+    ("transforms", "calls_to_evaluated_references"),
+    ("transforms", "validate_sweep"),
+    ("transforms", "compile_constraints"),
+    ("transforms", "bindings_to_singletons"),
+    ("transforms", "remove_prelude"),
+    ("e2e", "load_compiled_sweep"),
+    ("sweeps", "generate_config_dicts"),
+    ("sweeps", "invariant_bindings"),
+    ("rendering", "render"),
+    ("rendering", "compile_sweep_template"),
+    ("rendering", "render_template"),
+    ("parallel", "render_template"),
+    ("parallel", "write_template"),
+    ("archive", "write_archive"),
+    ("stream", "write_stream"),
+    ("cli", "write_file"),
+)
+
+# Generators of the sweep node types, instrumented with memory=True.
+node_stages = (
+    ("sweeps", "all", "node:All"),
+    ("sweeps", "product", "node:Product"),
+    ("sweeps", "constrained_product", "node:Product"),
+    ("sweeps", "union", "node:Union"),
+    ("sweeps", "table", "node:Table"),
+    ("sweeps", "external_table", "node:ExternalTable"),
+)
+
+# Caches, by the functions returning their functools cache info. Their hits and
+# misses during the profile are recorded.
+caches = (
+    ("rendering", "render_cache_info"),
+    ("tables", "cell_cache_info"),
+    ("e2e", "include_cache_info"),
+)
+
+# Stages producing the final configs, for computing the throughput.
+config_stages = {"rendering.render_template", "parallel.render_template"}
+# Stages returning the number of configs they wrote in worker processes.
+config_count_stages = {"parallel.write_template"}
+
+
+StageStats = collections.namedtuple(
+    "StageStats",
+    ["calls", "total_time", "self_time", "nodes", "peak_memory", "retained_memory"],
+)
+
+CacheStats = collections.namedtuple("CacheStats", ["hits", "misses"])
+
+
+def _cache_name(module_name, name):
+    return f"{module_name}.{name[: -len('_info')]}"
+
+
+class Profile:
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.calls = collections.Counter()
+        self.total_times = collections.Counter()
+        self.self_times = collections.Counter()
+        self.nodes = collections.Counter()
+        self.peak_memory = collections.Counter()
+        self.retained_memory = collections.Counter()
+        self.total_peak_memory = 0
+        self.cache_stats = {}
+        self.n_configs = 0
+        self.wall_time = 0.0
+        # Stack of [stage, start time, time spent in nested stages, memory in use
+        # at the start, peak memory so far].
+        self._stack = []
+        self._start_memory = 0
+        self._start_cache_infos = {}
+        self._outer_peak = 0
+
+    def _update_outer_peak(self, peak):
+        # tracemalloc only has one peak, so we reset it on every stage boundary and
+        # propagate the peak to the enclosing stage.
+        if self._stack:
+            self._stack[-1][4] = max(self._stack[-1][4], peak)
+        else:
+            self._outer_peak = max(self._outer_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _enter(self, stage):
+        if self.memory:
+            (current, peak) = tracemalloc.get_traced_memory()
+            self._update_outer_peak(peak)
+        else:
+            current = 0
+        self._stack.append([stage, time.perf_counter(), 0.0, current, current])
+
+    def _exit(self):
+        (stage, start, nested_time, start_memory, peak) = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.total_times[stage] += elapsed
+        self.self_times[stage] += elapsed - nested_time
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+        if self.memory:
+            (current, last_peak) = tracemalloc.get_traced_memory()
+            peak = max(peak, last_peak)
+            self.peak_memory[stage] = max(self.peak_memory[stage], peak - start_memory)
+            self.retained_memory[stage] += current - start_memory
+            self._update_outer_peak(peak)
+
+    def _cache_infos(self):
+        return {
+            _cache_name(module_name, name): getattr(
+                importlib.import_module(f"hyperion.{module_name}"), name
+            )()
+            for (module_name, name) in caches
+        }
+
+    def _start(self):
+        self._start_cache_infos = self._cache_infos()
+        if self.memory:
+            (self._start_memory, _) = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+    def _finish(self, wall_time):
+        self.wall_time = wall_time
+        for (cache, info) in self._cache_infos().items():
+            start_info = self._start_cache_infos[cache]
+            self.cache_stats[cache] = CacheStats(
+                hits=info.hits - start_info.hits,
+                misses=info.misses - start_info.misses,
+            )
+        if self.memory:
+            (_, peak) = tracemalloc.get_traced_memory()
+            self.total_peak_memory = max(self._outer_peak, peak) - self._start_memory
+
+    def _count_node(self):
+        self.nodes[self._stack[-1][0] if self._stack else "other"] += 1
+
+    def stage_stats(self):
+        return {
+            stage: StageStats(
+                calls=self.calls[stage],
+                total_time=self.total_times[stage],
+                self_time=self.self_times[stage],
+                nodes=self.nodes[stage],
+                peak_memory=self.peak_memory[stage],
+                retained_memory=self.retained_memory[stage],
+            )
+            for stage in self.calls
+        }
+
+    def cache_hit_rate(self, cache):
+        stats = self.cache_stats[cache]
+        lookups = stats.hits + stats.misses
+        if not lookups:
+            return 0.0
+        return stats.hits / lookups
+
+    def configs_per_second(self):
+        if not self.wall_time:
+            return 0.0
+        return self.n_configs / self.wall_time
+
+    def to_dict(self):
+        return {
+            "wall_time": self.wall_time,
+            "configs": self.n_configs,
+            "configs_per_second": self.configs_per_second(),
+            "stages": {
+                stage: stats._asdict() for (stage, stats) in self.stage_stats().items()
+            },
+            "caches": {
+                cache: {**stats._asdict(), "hit_rate": self.cache_hit_rate(cache)}
+                for (cache, stats) in self.cache_stats.items()
+            },
+            "other_nodes": self.nodes["other"],
+            "peak_memory": self.total_peak_memory,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def format(self):
+        header = (
+            f"{'stage':<40} {'calls':>8} {'total s':>9} {'self s':>9} {'nodes':>10}"
+        )
+        if self.memory:
+            header += f" {'peak MiB':>9} {'kept MiB':>9}"
+            sort_key = lambda item: item[1].peak_memory
+        else:
+            sort_key = lambda item: item[1].self_time
+
+        lines = [header]
+        for (stage, stats) in sorted(
+            self.stage_stats().items(), key=sort_key, reverse=True
+        ):
+            line = (
+                f"{stage:<40} {stats.calls:>8} {stats.total_time:>9.3f} "
+                f"{stats.self_time:>9.3f} {stats.nodes:>10}"
+            )
+            if self.memory:
+                line += (
+                    f" {stats.peak_memory / 2**20:>9.2f}"
+                    f" {stats.retained_memory / 2**20:>9.2f}"
+                )
+            lines.append(line)
+
+        for (cache, stats) in self.cache_stats.items():
+            lines.append(
+                f"{cache:<40} {stats.hits} hits, {stats.misses} misses "
+                f"({self.cache_hit_rate(cache):.1%} hit rate)"
+            )
+        lines.append(
+            f"{self.n_configs} configs in {self.wall_time:.3f} s "
+            f"({self.configs_per_second():.1f} configs/s)"
+        )
+        if self.memory:
+            lines.append(f"peak memory: {self.total_peak_memory / 2**20:.2f} MiB")
+        return "\n".join(lines)
+
+
+def _timed_generator(profile, stage, generator):
+    while True:
+        profile._enter(stage)
+        try:
+            item = next(generator)
+        except StopIteration:
+            return
+        finally:
+            profile._exit()
+        if stage in config_stages:
+            profile.n_configs += 1
+        yield item
+
+
+def _timed(profile, stage, fn):
+    @functools.wraps(fn)
+    def timed_fn(*args, **kwargs):
+        profile.calls[stage] += 1
+        profile._enter(stage)
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profile._exit()
+        if stage in config_count_stages:
+            profile.n_configs += result
+        if inspect.isgenerator(result):
+            return _timed_generator(profile, stage, result)
+        return result
+
+    return timed_fn
+
+
+def _counting_fold(profile, fold):
+    @functools.wraps(fold)
+    def counting_fold(f, tree):
+        profile._count_node()
+        return fold(f, tree)
+
+    return counting_fold
+
+
+_active_profile = None
+
+
+@contextlib.contextmanager
+def profile(callback=None, memory=False):
+    # Profiles the code inside the block. Yields the Profile, which is complete at
+    # the end of the block, and passes it to callback if given.
+    global _active_profile
+    if _active_profile is not None:
+        raise ValueError("Profiling is already enabled.")
+
+    result = Profile(memory=memory)
+    instrumented = [
+        (module_name, name, f"{module_name}.{name}") for (module_name, name) in stages
+    ]
+    if memory:
+        instrumented += node_stages
+
+    patches = []
+    for (module_name, name, stage) in instrumented:
+        module = importlib.import_module(f"hyperion.{module_name}")
+        fn = getattr(module, name)
+        patches.append((module, name, fn))
+        setattr(module, name, _timed(result, stage, fn))
+    transforms = importlib.import_module("hyperion.transforms")
+    patches.append((transforms, "fold", transforms.fold))
+    transforms.fold = _counting_fold(result, transforms.fold)
+
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    _active_profile = result
+    result._start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result._finish(time.perf_counter() - start)
+        if started_tracing:
+            tracemalloc.stop()
+        for (module, name, fn) in reversed(patches):
+            setattr(module, name, fn)
+        _active_profile = None
+
+    if callback is not None:
+        callback(result)
@@ -0,0 +1,61 @@
+import pytest
+
+from hyperion import e2e
+from hyperion import profiling
+from hyperion import transforms
+
+
+sweep = """
+f.x: [1, 2, 3]
+f.y = 2 * 3
+"""
+
+
+def test_profile_records_stages_and_configs():
+    fold = transforms.fold
+    profiles = []
+    with profiling.profile(callback=profiles.append) as profile:
+        configs = list(e2e.parse_sweep(sweep))
+
+    assert profiles == [profile]
+    assert profile.n_configs == len(configs) == 3
+    stats = profile.stage_stats()
+    assert stats["parsing.parse_sweep"].calls == 1
+    assert stats["transforms.partial_eval"].nodes > 0
+    preprocess_stats = stats["transforms.preprocess_sweep"]
+    assert preprocess_stats.self_time <= preprocess_stats.total_time
+    assert set(profile.to_dict()["stages"]) == set(stats)
+    # Everything is restored at the end.
+    assert transforms.fold is fold
+
+
+def test_profile_cannot_be_nested():
+    with profiling.profile():
+        with pytest.raises(ValueError):
+            with profiling.profile():
+                pass
+
+
+def test_profile_records_memory_of_stages_and_node_types():
+    with profiling.profile(memory=True) as profile:
+        configs = list(e2e.parse_sweep(sweep + "union:\n    g.z: [1, 2]\n"))
+
+    assert len(configs) == 6
+    stats = profile.stage_stats()
+    assert stats["parsing.parse_sweep"].peak_memory > 0
+    assert {"node:All", "node:Product", "node:Union"} <= set(stats)
+    assert profile.total_peak_memory >= stats["parsing.parse_sweep"].peak_memory
+    assert not profiling.tracemalloc.is_tracing()
+
+
+def test_profile_records_cache_hits():
+    with profiling.profile() as profile:
+        list(e2e.parse_sweep("union:\n    f.x: [1, 2]\n    f.x: [2, 3]"))
+
+    stats = profile.cache_stats["rendering.render_cache"]
+    assert stats.hits >= 1
+    assert profile.cache_hit_rate("rendering.render_cache") == stats.hits / (
+        stats.hits + stats.misses
+    )
+    assert profile.to_dict()["caches"]["rendering.render_cache"]["hits"] == stats.hits
+    assert "rendering.render_cache" in profile.format()
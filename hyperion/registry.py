@@ -0,0 +1,260 @@
+import contextlib
+
+from hyperion import ast
+from hyperion import e2e
+from hyperion import parsing
+from hyperion import rendering
+from hyperion import serialization
+from hyperion import sweeps
+from hyperion import transforms
+
+
+# Applying configs to the Gin registry directly from the syntax tree, without
+# rendering them to text and parsing again with Gin's parser. This mirrors
+# gin.parse_config, so we need to access Gin internals.
+
+compiled_config_magic = b"HYPCFG\n"
+compiled_config_extension = ".ginc"
+
+
+def _scoped_selector(identifier):
+    selector = ".".join(identifier.namespace.path + (identifier.name,))
+    return "/".join(identifier.scope.path + (selector,))
+
+
+def _binding_key(identifier):
+    # (scope, selector, arg_name), like in Gin's BindingStatement. Macros don't
+    # have a namespace, so their name is the selector.
+    scope = "/".join(identifier.scope.path)
+    if not identifier.namespace.path:
+        return (scope, identifier.name, "")
+    return (scope, ".".join(identifier.namespace.path), identifier.name)
+
+
+def _location(statement, index):
+    gin_config = e2e.gin_module.config
+    return gin_config.config_parser.Location(
+        filename=None,
+        line_num=index + 1,
+        char_num=None,
+        line_content=rendering.render(statement),
+    )
+
+
+@contextlib.contextmanager
+def _try_with_location(statement, index):
+    # Renders the statement for the error message only if something fails.
+    try:
+        yield
+    except Exception:
+        with e2e.gin_module.config.utils.try_with_location(_location(statement, index)):
+            raise
+
+
+def _to_value(expr, delegate):
+    def convert_node(node):
+        if type(node) is ast.String:
+            return str(node)
+        if type(node) is ast.List:
+            return list(node.items)
+        if type(node) is ast.Tuple:
+            return node.items
+        if type(node) is ast.Dict:
+            return dict(node.items)
+        if type(node) is ast.Macro:
+            return delegate.macro(node.name)
+        if type(node) is ast.Reference:
+            return delegate.configurable_reference(
+                _scoped_selector(node.identifier), False
+            )
+        if type(node) is ast.Call:
+            if node.arguments:
+                raise ValueError("Calls with arguments need to be preprocessed.")
+            return delegate.configurable_reference(
+                _scoped_selector(node.identifier), True
+            )
+        if type(node) in (ast.UnaryOp, ast.BinaryOp):
+            raise ValueError("Expressions need to be preprocessed.")
+        return node
+
+    return transforms.fold(convert_node, expr)
+
+
+def apply_config(config, skip_unknown=False):
+    # Binds the statements of a preprocessed ast.Config, with the same semantics
+    # and return value as gin.parse_config.
+    gin_config = e2e.gin_module.config
+    gin_config._validate_skip_unknown(skip_unknown)
+    if isinstance(skip_unknown, (list, tuple)):
+        skip_unknown = set(skip_unknown)
+
+    delegate = gin_config.ParserDelegate(skip_unknown)
+    includes = []
+    imports = []
+    with gin_config._parse_scope() as parse_context:
+        for (index, statement) in enumerate(config.statements):
+            if type(statement) is ast.Binding:
+                # Gin raises the errors in values from the parser, without
+                # adding the location.
+                value = _to_value(statement.expr, delegate)
+            with _try_with_location(statement, index):
+                if type(statement) is ast.Binding:
+                    (scope, selector, arg_name) = _binding_key(statement.identifier)
+                    if not arg_name:
+                        macro_name = f"{scope}/{selector}" if scope else selector
+                        gin_config.bind_parameter(
+                            (macro_name, "gin.macro", "value"), value
+                        )
+                    elif not gin_config._should_skip(selector, skip_unknown):
+                        gin_config.bind_parameter((scope, selector, arg_name), value)
+                elif type(statement) is ast.Import:
+                    import_statement = gin_config.config_parser.ImportStatement(
+                        module=".".join(statement.namespace.path),
+                        is_from=False,
+                        alias=None,
+                        location=_location(statement, index),
+                    )
+                    try:
+                        parse_context.process_import(import_statement)
+                    except ImportError:
+                        if not skip_unknown:
+                            raise
+                elif type(statement) is ast.Include:
+                    includes.append(
+                        gin_config.parse_config_file(str(statement.path), skip_unknown)
+                    )
+                else:
+                    raise ValueError(
+                        f"Unexpected {type(statement).__name__} statement in a "
+                        "preprocessed config."
+                    )
+        imports.extend(statement.module for statement in parse_context.imports)
+        gin_config._IMPORTS.update(parse_context.imports)
+    return (includes, imports)
+
+
+def compile_config(bindings):
+    tree = parsing.parse_config(e2e.join_bindings(bindings))
+    return transforms.preprocess_config(tree)
+
+
+def parse_config(bindings, skip_unknown=False):
+    return apply_config(compile_config(bindings), skip_unknown=skip_unknown)
+
+
+def generate_compiled_configs(bindings, dedupe=None):
+    # Yields the preprocessed configs of a sweep, ready for apply_config.
+    (sweep, prelude) = e2e.parse_and_preprocess_sweep(bindings)
+    for config in sweeps.generate_configs(sweep, dedupe=dedupe):
+        yield config._replace(statements=(prelude + config.statements))
+
+
+# Compiled configs on disk: a magic string followed by the serialized preprocessed
+# config. Loading one needs neither Hyperion's nor Gin's parser.
+
+
+def save_compiled_config(config, path):
+    with open(path, "wb") as f:
+        f.write(compiled_config_magic)
+        f.write(serialization.dumps(config))
+
+
+def load_compiled_config(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(compiled_config_magic):
+        raise ValueError(f"Not a compiled config: {path}.")
+    return serialization.loads(data[len(compiled_config_magic) :])
+
+
+def parse_compiled_config_file(path, skip_unknown=False):
+    return apply_config(load_compiled_config(path), skip_unknown=skip_unknown)
+
+
+# Sweep sessions:
+# ===============
+#
+# Running many small experiments in one process, parsing the configs is the main
+# overhead. A session binds the prelude and the bindings shared by all configs
+# once, snapshots the Gin state and then, for every config, restores the snapshot
+# and binds only the varying bindings.
+
+
+def _snapshot_gin_state():
+    gin_config = e2e.gin_module.config
+    return (
+        {key: dict(values) for (key, values) in gin_config._CONFIG.items()},
+        {key: dict(values) for (key, values) in gin_config._OPERATIVE_CONFIG.items()},
+        set(gin_config._IMPORTS),
+        dict(gin_config._SINGLETONS),
+        gin_config.config_is_locked(),
+    )
+
+
+def _restore_gin_state(state):
+    # Updates the dicts in place, in case anything holds references to them. Like
+    # gin.clear_config, this also resets the singletons and the lock set by
+    # gin.finalize, so every config gets fresh singletons and can be finalized.
+    gin_config = e2e.gin_module.config
+    (config, operative_config, imports, singletons, is_locked) = state
+    gin_config._set_config_is_locked(False)
+    for (gin_dict, snapshot) in (
+        (gin_config._CONFIG, config),
+        (gin_config._OPERATIVE_CONFIG, operative_config),
+    ):
+        gin_dict.clear()
+        gin_dict.update((key, dict(values)) for (key, values) in snapshot.items())
+    gin_config._IMPORTS.clear()
+    gin_config._IMPORTS.update(imports)
+    gin_config._SINGLETONS.clear()
+    gin_config._SINGLETONS.update(singletons)
+    gin_config._set_config_is_locked(is_locked)
+
+
+def compile_sweep_session(bindings, dedupe=None):
+    # Returns the base config and a generator of the preprocessed configs with
+    # just the varying bindings.
+    (sweep, prelude) = e2e.parse_and_preprocess_sweep(bindings)
+    invariant = sweeps.invariant_bindings(sweep)
+    base = ast.Config(
+        statements=(
+            prelude
+            + tuple(
+                ast.Binding(identifier=identifier, expr=expr)
+                for (identifier, expr) in invariant.items()
+            )
+        )
+    )
+
+    def generate_deltas():
+        for config_dict in sweeps.generate_config_dicts(sweep, dedupe=dedupe):
+            yield ast.Config(
+                statements=tuple(
+                    ast.Binding(identifier=identifier, expr=expr)
+                    for (identifier, expr) in config_dict.items()
+                    if identifier not in invariant
+                )
+            )
+
+    return (base, generate_deltas())
+
+
+@contextlib.contextmanager
+def sweep_session(bindings, dedupe=None, skip_unknown=False):
+    # Yields a generator of config indices. When it yields an index, the config is
+    # bound in Gin. The Gin state from before the session is restored at the end.
+    initial_state = _snapshot_gin_state()
+    try:
+        (base, deltas) = compile_sweep_session(bindings, dedupe=dedupe)
+        apply_config(base, skip_unknown=skip_unknown)
+        base_state = _snapshot_gin_state()
+
+        def bind_configs():
+            for (index, delta) in enumerate(deltas):
+                _restore_gin_state(base_state)
+                apply_config(delta, skip_unknown=skip_unknown)
+                yield index
+
+        yield bind_configs()
+    finally:
+        _restore_gin_state(initial_state)
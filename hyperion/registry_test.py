@@ -0,0 +1,121 @@
+import hypothesis as ht
+
+from hyperion import e2e
+from hyperion import rendering
+from hyperion import registry
+from hyperion import runtime
+from hyperion import testing
+
+
+settings = {
+    "phases": (ht.Phase.explicit, ht.Phase.reuse, ht.Phase.generate, ht.Phase.target),
+    "deadline": None,
+    "max_examples": 20,
+}
+
+
+def _canonical_value(value):
+    # gin.config_str sorts dicts with references as keys by their ids, so we
+    # compare the bindings directly.
+    if hasattr(value, "scoped_selector"):
+        return ("@", value.scoped_selector, value._evaluate)
+    if type(value) is dict:
+        return [
+            (_canonical_value(key), _canonical_value(item))
+            for (key, item) in value.items()
+        ]
+    if type(value) in (list, tuple):
+        return (type(value), [_canonical_value(item) for item in value])
+    return value
+
+
+def _bindings_or_exception(parse_fn, config):
+    try:
+        with testing.try_in_gin_sandbox(config) as gin:
+            runtime.register(gin)
+            e2e.register(gin)
+            with testing.try_with_eval():
+                parse_fn()
+            return _canonical_value(gin.config._CONFIG)
+    except Exception as e:
+        return type(e)
+
+
+@ht.settings(**settings)
+@ht.given(testing.configs(with_imports=False, with_includes=False))
+def test_parse_config_binds_the_same_as_gin(config):
+    rendered_config = rendering.render(config)
+    ht.note(f"Rendered config: {rendered_config}")
+    assert _bindings_or_exception(
+        lambda: registry.parse_config(rendered_config), config
+    ) == _bindings_or_exception(lambda: e2e.parse_config(rendered_config), config)
+
+
+def test_parse_compiled_config_file_binds_values(tmp_path):
+    config = registry.compile_config(["m = 3", "f.x = %m * 2", "f.y = @g()"])
+    path = str(tmp_path / ("config" + registry.compiled_config_extension))
+    registry.save_compiled_config(config, path)
+    assert registry.load_compiled_config(path) == config
+
+    with testing.gin_sandbox() as gin:
+        runtime.register(gin)
+        e2e.register(gin)
+        f = gin.external_configurable(lambda x, y: (x, y), name="f")
+        gin.external_configurable(lambda: "g", name="g")
+        registry.parse_compiled_config_file(path)
+        assert f() == (6, "g")
+
+
+def test_generate_compiled_configs_applies_every_config():
+    sweep = "f.x: [1, 2]\nf.y = 3 * 2\n"
+    values = []
+    for config in registry.generate_compiled_configs(sweep):
+        with testing.gin_sandbox() as gin:
+            runtime.register(gin)
+            e2e.register(gin)
+            f = gin.external_configurable(lambda x, y: (x, y), name="f")
+            registry.apply_config(config)
+            values.append(f())
+    assert values == [(1, 6), (2, 6)]
+
+
+def test_sweep_session_binds_every_config_and_restores_state(tmp_path):
+    base_path = tmp_path / "base.gin"
+    base_path.write_text("f.z = 5")
+    sweep = f"include '{base_path}'\nf.x: [1, 2]\nf.y = 3 * 2\n"
+    with testing.gin_sandbox() as gin:
+        runtime.register(gin)
+        e2e.register(gin)
+        f = gin.external_configurable(lambda x=0, y=0, z=0: (x, y, z), name="f")
+        gin.bind_parameter("f.y", 1)
+
+        values = []
+        with registry.sweep_session(sweep) as configs:
+            for index in configs:
+                values.append((index, f()))
+                # Bindings made during a run don't leak into the next one.
+                gin.bind_parameter("f.z", 0)
+        assert values == [(0, (1, 6, 5)), (1, (2, 6, 5))]
+        assert f() == (0, 1, 0)
+
+
+def test_sweep_session_resets_singletons_and_finalize():
+    sweep = (
+        "f.x: [1, 2]\nf.y = @obj/gin.singleton()\nobj/gin.singleton.constructor = @g"
+    )
+    with testing.gin_sandbox() as gin:
+        runtime.register(gin)
+        e2e.register(gin)
+        f = gin.external_configurable(lambda x=0, y=None: (x, y), name="f")
+        gin.external_configurable(object, name="g")
+
+        values = []
+        with registry.sweep_session(sweep) as configs:
+            for index in configs:
+                gin.finalize()
+                values.append(f())
+        # Every config gets its own singleton and can be finalized.
+        assert [x for (x, _) in values] == [1, 2]
+        assert values[0][1] is not values[1][1]
+        assert not gin.config_is_locked()
+        assert not gin.config._SINGLETONS
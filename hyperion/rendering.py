@@ -1,167 +1,382 @@
+import collections
+import functools
+
 from hyperion import ast
-from hyperion import transforms
+from hyperion import sweeps
+from hyperion import tables
 
 
-def render_config_or_sweep(config_or_sweep):
-    return "\n".join(config_or_sweep.statements)
+# Rendering writes the text of a tree in a single traversal, dispatching on the
+# node types through the static tables below. The writers take a node and a
+# write function, e.g. list.append of a buffer or the write method of a file.
+# Statements also take the indent of their lines, as the blocks nest.
+#
+# Expressions are parenthesized based on the precedence of their operands, which
+# is known from the node types without rendering them.
 
+indent_step = "    "
+
+
+def expr_precedence(node):
+    node_type = type(node)
+    if node_type is ast.BinaryOp or node_type is ast.UnaryOp:
+        return ast.operator_precedence(node.operator)
+    if node_type is ast.Call:
+        return 1
+    return 0
 
-def render_identifier(node):
-    scope = node.scope
-    if scope:
-        scope += "/"
 
-    namespace = node.namespace
+def identifier_text(node):
+    text = node.name
+    namespace = ".".join(node.namespace.path)
     if namespace:
-        namespace += "."
+        text = namespace + "." + text
+    scope = "/".join(node.scope.path)
+    if scope:
+        text = scope + "/" + text
+    return text
 
-    return scope + namespace + node.name
 
+def write_expr(node, write):
+    writer = expr_writers.get(type(node))
+    if writer is None:
+        # Primitive literals.
+        write(str(node))
+    else:
+        writer(node, write)
 
-def render_binding(node):
-    (expr, _) = node.expr
-    return f"{node.identifier} = {expr}"
 
+def write_exprs(exprs, write):
+    for (i, expr) in enumerate(exprs):
+        if i:
+            write(", ")
+        write_expr(expr, write)
 
-# The expression rendering functions return pairs (text, precedence).
 
+def write_operand(node, write, parenthesize):
+    if parenthesize:
+        write("(")
+        write_expr(node, write)
+        write(")")
+    else:
+        write_expr(node, write)
 
-def extract_expr(item):
-    (expr, _) = item
-    return expr
 
+def write_unary_op(node, write):
+    precedence = ast.operator_precedence(node.operator)
+    write(ast.operator_chars(node.operator))
+    write_operand(node.operand, write, expr_precedence(node.operand) > precedence)
 
-def extract_exprs(seq):
-    return tuple(map(extract_expr, seq))
 
+def write_binary_op(node, write):
+    precedence = ast.operator_precedence(node.operator)
+    left_precedence = expr_precedence(node.left)
+    right_precedence = expr_precedence(node.right)
+    chain_left = right_precedence == precedence and node.operator != "pow"
+    chain_right = left_precedence == precedence and node.operator == "pow"
+    write_operand(node.left, write, left_precedence > precedence or chain_right)
+    write(f" {ast.operator_chars(node.operator)} ")
+    write_operand(node.right, write, right_precedence > precedence or chain_left)
 
-def render_dict(node):
-    text = (
-        "{"
-        + ", ".join(
-            f"{extract_expr(key)}: {extract_expr(value)}" for (key, value) in node.items
-        )
-        + "}"
-    )
-    return (text, 0)
 
+def write_dict(node, write):
+    write("{")
+    for (i, (key, value)) in enumerate(node.items):
+        if i:
+            write(", ")
+        write_expr(key, write)
+        write(": ")
+        write_expr(value, write)
+    write("}")
 
-def render_list(node):
-    exprs = extract_exprs(node.items)
-    text = "[" + ", ".join(map(str, exprs)) + "]"
-    return (text, 0)
 
+def write_list(node, write):
+    write("[")
+    write_exprs(node.items, write)
+    write("]")
 
-def render_tuple(node):
-    exprs = extract_exprs(node.items)
-    if len(exprs) == 1:
-        text = f"({exprs[0]},)"
-    else:
-        text = "(" + ", ".join(map(str, exprs)) + ")"
-    return (text, 0)
 
+def write_tuple(node, write):
+    write("(")
+    write_exprs(node.items, write)
+    write(",)" if len(node.items) == 1 else ")")
 
-def render_call(node):
-    args = ", ".join(
-        f"{name}={extract_expr(value)}" for (name, value) in node.arguments
-    )
-    return (f"@{node.identifier}({args})", 1)
 
+def write_call(node, write):
+    write(f"@{identifier_text(node.identifier)}(")
+    for (i, (name, value)) in enumerate(node.arguments):
+        write(f", {name}=" if i else f"{name}=")
+        write_expr(value, write)
+    write(")")
 
-def render_unary_op(node):
-    operator_chars = ast.operator_chars(node.operator)
-    (operand_text, operand_precedence) = node.operand
-    precedence = ast.operator_precedence(node.operator)
-    if operand_precedence > precedence:
-        operand_text = f"({operand_text})"
-    text = f"{operator_chars}{operand_text}"
-    return (text, precedence)
 
+expr_writers = {
+    ast.UnaryOp: write_unary_op,
+    ast.BinaryOp: write_binary_op,
+    ast.Dict: write_dict,
+    ast.List: write_list,
+    ast.Tuple: write_tuple,
+    ast.Macro: lambda node, write: write(f"%{node.name}"),
+    ast.Reference: lambda node, write: write(f"@{identifier_text(node.identifier)}"),
+    ast.Call: write_call,
+    ast.String: lambda node, write: write(repr(node)),  # Add quotes.
+}
+
+
+def write_block(header, statements, write, indent):
+    # Every line break is followed by the indent, also when there are no lines.
+    write(header + ":\n" + indent)
+    indent += indent_step
+    for (i, statement) in enumerate(statements):
+        write("\n" + indent if i else indent_step)
+        write_node(statement, write, indent)
+
+
+def write_config_or_sweep(node, write, indent):
+    for (i, statement) in enumerate(node.statements):
+        if i:
+            write("\n" + indent)
+        write_node(statement, write, indent)
+
+
+def write_include(node, write, indent):
+    write("include ")
+    write_expr(node.path, write)
+
+
+def write_binding(node, write, indent):
+    write(identifier_text(node.identifier))
+    write(" = ")
+    write_expr(node.expr, write)
+
+
+def write_with(node, write, indent):
+    write_block(f"with {'.'.join(node.namespace.path)}", node.statements, write, indent)
+
+
+def write_all(node, write, indent):
+    write(identifier_text(node.identifier))
+    write(": [")
+    write_exprs(node.exprs, write)
+    write("]")
+
+
+def header_text(node):
+    return ", ".join(map(identifier_text, node.identifiers))
+
+
+def write_row(node, write, indent):
+    write_exprs(node.exprs, write)
+
+
+def write_external_table(node, write, indent):
+    write(f"table {header_text(node.header)} from ")
+    write_expr(node.source, write)
+
+
+def write_where(node, write, indent):
+    write("where ")
+    write_expr(node.expr, write)
 
-def render_binary_op(node):
-    (left_text, left_precedence) = node.left
-    operator_chars = ast.operator_chars(node.operator)
-    (right_text, right_precedence) = node.right
-    precedence = ast.operator_precedence(node.operator)
-    chain_left = right_precedence == precedence and node.operator != "pow"
-    chain_right = left_precedence == precedence and node.operator == "pow"
-    if left_precedence > precedence or chain_right:
-        left_text = f"({left_text})"
-    if right_precedence > precedence or chain_left:
-        right_text = f"({right_text})"
-    text = f"{left_text} {operator_chars} {right_text}"
-    return (text, precedence)
-
-
-def render_all(node):
-    exprs = extract_exprs(node.exprs)
-    return f"{node.identifier}: [" + ", ".join(map(str, exprs)) + "]"
-
-
-def add_indent(text):
-    indent = "    "
-    return indent + text.replace("\n", "\n" + indent)
-
-
-def render_block(node):
-    header = {
-        ast.Product: lambda: "product",
-        ast.Union: lambda: "union",
-        ast.With: lambda: f"with {node.namespace}",
-    }[type(node)]()
-    return f"{header}:\n" + "\n".join(map(add_indent, node.statements))
-
-
-def render_table(node):
-    return f"table {node.header}:\n" + "\n".join(map(add_indent, node.rows))
-
-
-def render_row(node):
-    exprs = extract_exprs(node.exprs)
-    return ", ".join(map(str, exprs))
-
-
-def render_node(node):
-    render_map = {
-        # Configs:
-        ast.Config: render_config_or_sweep,
-        ast.Import: lambda node: f"import {node.namespace}",
-        ast.Include: lambda node: f"include {extract_expr(node.path)}",
-        ast.Namespace: lambda node: ".".join(node.path),
-        ast.Binding: render_binding,
-        ast.Identifier: render_identifier,
-        ast.Scope: lambda node: "/".join(node.path),
-        ast.With: render_block,
-        ast.UnaryOp: render_unary_op,
-        ast.BinaryOp: render_binary_op,
-        ast.Dict: render_dict,
-        ast.List: render_list,
-        ast.Tuple: render_tuple,
-        ast.Macro: lambda node: (f"%{node.name}", 0),
-        ast.Reference: lambda node: (f"@{node.identifier}", 0),
-        ast.Call: render_call,
-        ast.String: lambda node: (
-            repr(node),  # Add quotes.
-            0,
-        ),
-        str: lambda node: node,  # Name.
-        tuple: lambda node: node,  # Internal sequence, e.g. namespace path.
-        # Sweeps:
-        ast.Sweep: render_config_or_sweep,
-        ast.All: render_all,
-        ast.Product: render_block,
-        ast.Union: render_block,
-        ast.Table: render_table,
-        ast.Header: lambda node: ", ".join(node.identifiers),
-        ast.Row: render_row,
-    }
-
-    if type(node) in render_map:
-        return render_map[type(node)](node)
+
+writers = {
+    # Configs:
+    ast.Config: write_config_or_sweep,
+    ast.Import: lambda node, write, indent: write(
+        f"import {'.'.join(node.namespace.path)}"
+    ),
+    ast.Include: write_include,
+    ast.Namespace: lambda node, write, indent: write(".".join(node.path)),
+    ast.Binding: write_binding,
+    ast.Identifier: lambda node, write, indent: write(identifier_text(node)),
+    ast.Scope: lambda node, write, indent: write("/".join(node.path)),
+    ast.With: write_with,
+    # Sweeps:
+    ast.Sweep: write_config_or_sweep,
+    ast.All: write_all,
+    ast.Product: lambda node, write, indent: write_block(
+        "product", node.statements, write, indent
+    ),
+    ast.Union: lambda node, write, indent: write_block(
+        "union", node.statements, write, indent
+    ),
+    ast.Table: lambda node, write, indent: write_block(
+        f"table {header_text(node.header)}", node.rows, write, indent
+    ),
+    ast.Header: lambda node, write, indent: write(header_text(node)),
+    ast.Row: write_row,
+    ast.Where: write_where,
+    ast.ExternalTable: write_external_table,
+}
+
+
+def write_node(node, write, indent=""):
+    writer = writers.get(type(node))
+    if writer is None:
+        write_expr(node, write)
     else:
-        # Primitive literals - expressions with precedence 0.
-        return (str(node), 0)
+        writer(node, write, indent)
+
+
+def render_to(tree, file):
+    # Writes the text of a config, a sweep or any of their nodes to a text file,
+    # e.g. a socket opened with makefile("w").
+    write_node(tree, file.write)
 
 
 def render(tree):
-    return transforms.fold(render_node, tree)
+    # Returns the text of configs, sweeps, their statements and identifiers, and
+    # pairs (text, precedence) of expressions. Tuples are rendered elementwise.
+    tree_type = type(tree)
+    if tree_type is tuple:
+        return tuple(map(render, tree))
+    if tree_type is str:
+        # Name.
+        return tree
+
+    chunks = []
+    writer = writers.get(tree_type)
+    if writer is None:
+        write_expr(tree, chunks.append)
+        return ("".join(chunks), expr_precedence(tree))
+    writer(tree, chunks.append, "")
+    return "".join(chunks)
+
+
+# Render cache:
+# =============
+#
+# Across a sweep, the same bindings get rendered many times, e.g. the rows of an
+# external table, which is read again for every config of the statements before
+# it. The rendered lines are cached, keyed on the identifiers and expressions.
+# Equal values of different types render differently, e.g. 1, 1.0 and True, or
+# 0.0 and -0.0, so the keys of the expressions include the types of the values.
+
+
+def cache_key(expr):
+    expr_type = type(expr)
+    if expr_type is tuple:
+        return tuple(map(cache_key, expr))
+    if expr_type is float:
+        return (expr_type, repr(expr))
+    if expr_type in (bool, int, complex, ast.String):
+        return (expr_type, expr)
+    if isinstance(expr, tuple):
+        # Node.
+        return (expr_type,) + tuple(map(cache_key, expr))
+    return expr
+
+
+def render_binding(identifier, expr):
+    return _render_binding(identifier, expr, cache_key(expr))
+
+
+@functools.lru_cache(maxsize=2**16)
+def _render_binding(identifier, expr, expr_key):
+    return render(ast.Binding(identifier=identifier, expr=expr))
+
+
+def render_cache_info():
+    return _render_binding.cache_info()
+
+
+def clear_render_cache():
+    _render_binding.cache_clear()
+
+
+# Sweep templates:
+# ================
+#
+# Rendering every generated config from scratch renders the same identifiers and
+# values over and over. Instead, we render the prelude and every binding in the
+# leaves of the preprocessed sweep once. Generating a config then only requires
+# joining the pre-rendered lines. Bindings with identifiers in exclude are left
+# out, e.g. the ones moved to a shared base config.
+
+SweepTemplate = collections.namedtuple("SweepTemplate", ["prelude", "sweep", "exclude"])
+
+
+class TableLine(str):
+    # Rendered binding from an external table. It keeps the expression for the
+    # constraints, so we don't need to map the lines of all rows back.
+    def __new__(cls, line, expr):
+        table_line = super().__new__(cls, line)
+        table_line.expr = expr
+        return table_line
+
+
+def render_table_line(identifier, expr):
+    return TableLine(render_binding(identifier, expr), expr)
+
+
+class LineToExpr(dict):
+    def __missing__(self, line):
+        return line.expr
+
+
+def compile_sweep_template(sweep, prelude, exclude=frozenset()):
+    # Constraints need the values of the bindings, so we keep a mapping back from
+    # the rendered lines.
+    line_to_expr = LineToExpr()
+
+    def render_binding_line(identifier, expr):
+        line = render_binding(identifier, expr)
+        line_to_expr[line] = expr
+        return line
+
+    def compile_node(node):
+        if type(node) is ast.Where:
+            return node._replace(expr=node.expr.with_decode(line_to_expr))
+
+        if type(node) is ast.All:
+            return node._replace(
+                exprs=tuple(
+                    render_binding_line(node.identifier, expr) for expr in node.exprs
+                )
+            )
+
+        if type(node) is ast.Table:
+            identifiers = node.header.identifiers
+            return node._replace(
+                rows=tuple(
+                    row._replace(
+                        exprs=tuple(
+                            render_binding_line(identifier, expr)
+                            for (identifier, expr) in zip(identifiers, row.exprs)
+                        )
+                    )
+                    for row in node.rows
+                )
+            )
+
+        if type(node) is ast.ExternalTable:
+            return node._replace(
+                source=tables.TableSource(str(node.source), render_table_line)
+            )
+
+        # Block - don't descend into the expressions, as fold would.
+        return node._replace(statements=tuple(map(compile_node, node.statements)))
+
+    return SweepTemplate(
+        prelude=tuple(map(render, prelude)),
+        sweep=compile_node(sweep),
+        exclude=frozenset(exclude),
+    )
+
+
+def render_line_dict(template, line_dict):
+    # line_dict maps identifiers to the rendered binding lines.
+    if template.exclude:
+        lines = tuple(
+            line
+            for (identifier, line) in line_dict.items()
+            if identifier not in template.exclude
+        )
+    else:
+        lines = tuple(line_dict.values())
+    return "\n".join(template.prelude + lines)
+
+
+def render_template(template, dedupe=None):
+    for line_dict in sweeps.generate_config_dicts(template.sweep, dedupe=dedupe):
+        yield render_line_dict(template, line_dict)
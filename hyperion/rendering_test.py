@@ -0,0 +1,65 @@
+import io
+
+import hypothesis as ht
+from hypothesis import strategies as st
+import pytest
+
+from hyperion import ast
+from hyperion import parsing
+from hyperion import rendering
+from hyperion import sweeps
+from hyperion import testing
+from hyperion import transforms
+
+
+@ht.settings(deadline=500)
+@ht.given(testing.sweeps())
+def test_render_template_equals_render(sweep):
+    with testing.try_with_eval():
+        preprocessed_sweep = transforms.preprocess_sweep(sweep)
+    (preprocessed_sweep, prelude) = transforms.remove_prelude(preprocessed_sweep)
+
+    expected_configs = [
+        rendering.render(config._replace(statements=(prelude + config.statements)))
+        for config in sweeps.generate_configs(preprocessed_sweep)
+    ]
+    template = rendering.compile_sweep_template(preprocessed_sweep, prelude)
+    assert list(rendering.render_template(template)) == expected_configs
+
+
+@ht.given(st.one_of(testing.configs(), testing.sweeps()))
+def test_render_to_writes_the_rendered_text(tree):
+    f = io.StringIO()
+    rendering.render_to(tree, f)
+    assert f.getvalue() == rendering.render(tree)
+
+
+@pytest.mark.parametrize(
+    "exprs",
+    [("1", "1.0", "True"), ("0.0", "-0.0"), ("[1, 2]", "[True, 2]", "(1, 2)")],
+)
+def test_render_cache_tells_equal_values_of_different_types_apart(exprs):
+    rendering.clear_render_cache()
+    identifier = transforms.make_identifier(("f",), "x")
+    for expr in exprs:
+        expr = transforms.partial_eval(parsing.parse_expr(expr))
+        line = rendering.render_binding(identifier, expr)
+        assert line == rendering.render(ast.Binding(identifier=identifier, expr=expr))
+    assert rendering.render_cache_info().hits == 0
+
+
+def test_render_cache_hits_equal_bindings():
+    rendering.clear_render_cache()
+    for _ in range(3):
+        identifier = transforms.make_identifier(("f",), "x")
+        rendering.render_binding(identifier, parsing.parse_expr("@g(y=[1, 'a'])"))
+    info = rendering.render_cache_info()
+    assert (info.hits, info.misses) == (2, 1)
+
+
+def test_cache_keys_tell_equal_values_of_different_types_apart():
+    exprs = [parsing.parse_expr(text) for text in ("[1, 2]", "[True, 2]", "(1, 2)")]
+    assert len(set(map(rendering.cache_key, exprs))) == 3
+    # The nodes themselves keep the hash and equality of tuples.
+    binding = ast.Binding(identifier="x", expr=1)
+    assert len({binding, binding._replace(expr=True)}) == 1
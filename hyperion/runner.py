@@ -0,0 +1,187 @@
+import asyncio
+import collections
+import hashlib
+import json
+import os
+
+from hyperion import aio
+from hyperion import pool
+
+
+# Running a command for every config of a sweep in local subprocesses, with at
+# most `jobs` of them at a time. The configs are taken from the generator as the
+# slots free up, so they're never all held in memory.
+#
+# Every run writes its config to {name}_{index}.gin and its output to
+# {name}_{index}.log in run_dir. Finished runs are appended to
+# {name}_status.jsonl with their exit codes and the hashes of their configs, so an
+# interrupted sweep can be resumed: runs that succeeded with the same config are
+# skipped, and the rest run again.
+
+run_outcomes = ("succeeded", "failed", "skipped")
+
+
+def content_hash(text):
+    # Also used for the manifests of incrementally written configs.
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def read_status(path):
+    # Returns a dict from the indices of the succeeded runs to their config hashes.
+    succeeded = {}
+    if not os.path.exists(path):
+        return succeeded
+
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Truncated by an interruption.
+                continue
+            if record["returncode"] == 0:
+                succeeded[record["index"]] = record["hash"]
+            else:
+                succeeded.pop(record["index"], None)
+    return succeeded
+
+
+def run_path_prefix(run_dir, sweep_file, index):
+    # The config and the log of a run are at this path plus .gin and .log.
+    (name_core, _) = os.path.splitext(os.path.basename(sweep_file))
+    return os.path.join(run_dir, f"{name_core}_{index}")
+
+
+def format_command(command, config_path, index):
+    # Substitutes {config} and {index} in the arguments. Without {config}, the
+    # path of the config goes at the end.
+    if not any("{config}" in arg for arg in command):
+        command = list(command) + ["{config}"]
+    return [
+        arg.replace("{config}", config_path).replace("{index}", str(index))
+        for arg in command
+    ]
+
+
+async def run_process(args, log_path):
+    # Returns the exit code. Terminates the process if cancelled.
+    with open(log_path, "wb") as log_file:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=log_file,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+        except OSError as error:
+            # E.g. the command doesn't exist. The run fails with the exit code a
+            # shell would return, and the error goes to the log.
+            log_file.write(f"{error}\n".encode())
+            return 127 if isinstance(error, FileNotFoundError) else 126
+        try:
+            return await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+            raise
+
+
+async def run_sweep(
+    sweep_file, command, run_dir, jobs, dedupe=None, run_config=None, report=None
+):
+    # Returns a Counter with the number of runs per outcome in run_outcomes.
+    # run_config(index, config, config_path, log_path) is a coroutine returning
+    # the exit code, by default running the command. report(index, outcome,
+    # returncode) is called after every run.
+    if run_config is None:
+
+        async def run_config(index, config, config_path, log_path):
+            return await run_process(
+                format_command(command, config_path, index), log_path
+            )
+
+    os.makedirs(run_dir, exist_ok=True)
+    (name_core, _) = os.path.splitext(os.path.basename(sweep_file))
+    status_path = os.path.join(run_dir, f"{name_core}_status.jsonl")
+    succeeded = read_status(status_path)
+
+    counts = collections.Counter({outcome: 0 for outcome in run_outcomes})
+    slots = asyncio.Semaphore(jobs)
+    tasks = set()
+    # Exceptions of the finished runs, raised by the main loop.
+    errors = []
+
+    def finish_task(task):
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    with open(status_path, "a") as status_file:
+
+        async def run_one(index, config, digest):
+            try:
+                path_prefix = run_path_prefix(run_dir, sweep_file, index)
+                config_path = path_prefix + ".gin"
+                with open(config_path, "w") as f:
+                    f.write(config)
+                returncode = await run_config(
+                    index, config, config_path, path_prefix + ".log"
+                )
+
+                record = {"index": index, "hash": digest, "returncode": returncode}
+                status_file.write(json.dumps(record) + "\n")
+                status_file.flush()
+                outcome = "succeeded" if returncode == 0 else "failed"
+                counts[outcome] += 1
+                if report is not None:
+                    report(index, outcome, returncode)
+            finally:
+                slots.release()
+
+        try:
+            index = 0
+            async for config in aio.aparse_sweep_file(sweep_file, dedupe=dedupe):
+                digest = content_hash(config)
+                if succeeded.get(index) == digest:
+                    counts["skipped"] += 1
+                    if report is not None:
+                        report(index, "skipped", 0)
+                else:
+                    await slots.acquire()
+                    if errors:
+                        raise errors[0]
+                    task = asyncio.create_task(run_one(index, config, digest))
+                    tasks.add(task)
+                    task.add_done_callback(finish_task)
+                index += 1
+
+            await asyncio.gather(*tasks)
+            if errors:
+                raise errors[0]
+        finally:
+            # On errors and interruptions, stop the runs in progress.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return counts
+
+
+async def run_sweep_warm(sweep_file, spec, run_dir, jobs, dedupe=None, report=None):
+    # Like run_sweep, but runs the configs in a pool.WarmPool calling the entry
+    # point spec, "module:function", instead of a command.
+    async with pool.WarmPool(spec) as warm_pool:
+
+        async def run_config(index, config, config_path, log_path):
+            return await warm_pool.run(index, config, log_path)
+
+        return await run_sweep(
+            sweep_file,
+            (),
+            run_dir,
+            jobs,
+            dedupe=dedupe,
+            run_config=run_config,
+            report=report,
+        )
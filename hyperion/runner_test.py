@@ -0,0 +1,139 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+from hyperion import e2e
+from hyperion import runner
+
+
+sweep = """
+f.a: [1, 2, 3]
+f.b: [4, 5]
+"""
+
+
+@pytest.fixture
+def sweep_path(tmp_path):
+    path = tmp_path / "sweep.hyp"
+    path.write_text(sweep)
+    return str(path)
+
+
+def run_sweep(sweep_path, run_dir, run_config, jobs=2):
+    return asyncio.run(
+        runner.run_sweep(sweep_path, (), str(run_dir), jobs, run_config=run_config)
+    )
+
+
+def test_runs_every_config_with_bounded_concurrency(sweep_path, tmp_path):
+    running = 0
+    max_running = 0
+    configs = {}
+
+    async def run_config(index, config, config_path, log_path):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        with open(config_path) as f:
+            configs[index] = f.read()
+        running -= 1
+        return 0
+
+    counts = run_sweep(sweep_path, tmp_path / "runs", run_config, jobs=2)
+    assert counts == {"succeeded": 6, "failed": 0, "skipped": 0}
+    assert max_running == 2
+    assert [configs[index] for index in range(6)] == list(
+        e2e.parse_sweep_file(sweep_path)
+    )
+
+
+def test_resumes_from_the_status_file(sweep_path, tmp_path):
+    run_dir = tmp_path / "runs"
+
+    async def fail_odd(index, config, config_path, log_path):
+        return index % 2
+
+    assert run_sweep(sweep_path, run_dir, fail_odd) == {
+        "succeeded": 3,
+        "failed": 3,
+        "skipped": 0,
+    }
+
+    rerun = []
+
+    async def succeed(index, config, config_path, log_path):
+        rerun.append(index)
+        return 0
+
+    assert run_sweep(sweep_path, run_dir, succeed) == {
+        "succeeded": 3,
+        "failed": 0,
+        "skipped": 3,
+    }
+    assert sorted(rerun) == [1, 3, 5]
+
+    # Changed configs run again.
+    with open(sweep_path, "w") as f:
+        f.write(sweep.replace("5]", "6]"))
+    rerun.clear()
+    run_sweep(sweep_path, run_dir, succeed)
+    assert sorted(rerun) == [1, 3, 5]
+
+
+def test_ignores_truncated_status_lines(tmp_path):
+    path = tmp_path / "status.jsonl"
+    path.write_text(
+        json.dumps({"index": 0, "hash": "a", "returncode": 0})
+        + "\n"
+        + json.dumps({"index": 1, "hash": "b", "returncode": 0})[:10]
+    )
+    assert runner.read_status(str(path)) == {0: "a"}
+
+
+def test_format_command():
+    assert runner.format_command(["x", "{config}", "--i={index}"], "c.gin", 3) == [
+        "x",
+        "c.gin",
+        "--i=3",
+    ]
+    assert runner.format_command(["x"], "c.gin", 3) == ["x", "c.gin"]
+
+
+def test_runs_processes_with_logs(sweep_path, tmp_path):
+    run_dir = tmp_path / "runs"
+    script = (
+        "import sys; config = open(sys.argv[1]).read(); print(config); "
+        "sys.exit('f.a = 2' in config)"
+    )
+    command = [sys.executable, "-c", script, "{config}"]
+    counts = asyncio.run(runner.run_sweep(sweep_path, command, str(run_dir), 3))
+    assert counts == {"succeeded": 4, "failed": 2, "skipped": 0}
+    for (index, config) in enumerate(e2e.parse_sweep_file(sweep_path)):
+        prefix = runner.run_path_prefix(str(run_dir), sweep_path, index)
+        with open(prefix + ".log") as f:
+            assert f.read().strip() == config
+
+
+def test_records_commands_that_fail_to_start(sweep_path, tmp_path):
+    run_dir = tmp_path / "runs"
+    command = [str(tmp_path / "nonexistent")]
+    counts = asyncio.run(runner.run_sweep(sweep_path, command, str(run_dir), 2))
+    assert counts == {"succeeded": 0, "failed": 6, "skipped": 0}
+    with open(run_dir / "sweep_status.jsonl") as f:
+        assert [json.loads(line)["returncode"] for line in f] == [127] * 6
+    with open(runner.run_path_prefix(str(run_dir), sweep_path, 0) + ".log") as f:
+        assert "nonexistent" in f.read()
+
+
+def test_raises_errors_of_finished_runs(sweep_path, tmp_path):
+    async def run_config(index, config, config_path, log_path):
+        if index == 1:
+            raise ValueError("broken run")
+        await asyncio.sleep(0.01)
+        return 0
+
+    with pytest.raises(ValueError, match="broken run"):
+        run_sweep(sweep_path, tmp_path / "runs", run_config)
@@ -1,14 +1,67 @@
+import collections
+import functools
+
 from hyperion import transforms
 
 
-def eval_unary_op(o, v):
+# Gin calls the expression configurables on every query of a binding that uses
+# them. The operators are pure, so for literal operands we cache the results.
+# Keys are typed, so e.g. 1 and 1.0 don't share an entry. Signed zeros compare
+# equal, but can give different results, so we don't cache them. Complex numbers
+# have signed zero components, so we skip them altogether.
+
+cache_size = 4096
+_cacheable_types = {bool, int, float, str, type(None)}
+
+# Number of evaluations, including the ones answered from the cache.
+counters = collections.Counter()
+
+
+def is_cacheable(value):
+    return type(value) in _cacheable_types and not (type(value) is float and value == 0)
+
+
+@functools.lru_cache(maxsize=cache_size, typed=True)
+def _cached_unary_op(o, v):
     return transforms.eval_unary_op(operator=o, operand=v)
 
 
-def eval_binary_op(l, o, r):
+@functools.lru_cache(maxsize=cache_size, typed=True)
+def _cached_binary_op(l, o, r):
     return transforms.eval_binary_op(left=l, operator=o, right=r)
 
 
+def eval_unary_op(o, v):
+    counters["unary_ops"] += 1
+    if is_cacheable(v):
+        return _cached_unary_op(o, v)
+    return transforms.unary_operator_functions[o](v)
+
+
+def eval_binary_op(l, o, r):
+    counters["binary_ops"] += 1
+    if is_cacheable(l) and is_cacheable(r):
+        return _cached_binary_op(l, o, r)
+    return transforms.binary_operator_functions[o](l, r)
+
+
+def stats():
+    unary_info = _cached_unary_op.cache_info()
+    binary_info = _cached_binary_op.cache_info()
+    return {
+        "unary_ops": counters["unary_ops"],
+        "binary_ops": counters["binary_ops"],
+        "cache_hits": unary_info.hits + binary_info.hits,
+        "cache_misses": unary_info.misses + binary_info.misses,
+    }
+
+
+def reset_stats():
+    counters.clear()
+    _cached_unary_op.cache_clear()
+    _cached_binary_op.cache_clear()
+
+
 def register(gin):
     # Use short names to minimize the generated configs.
     gin.external_configurable(eval_unary_op, name="_u", module="_h")
@@ -44,3 +44,24 @@ def test_runtime_eval_equals_partial_eval(expr):
             testing.assert_exception_equal(actual_exc, expected_exc, from_gin=True)
         else:
             assert not expected_exc and actual_value == expected_value
+
+
+def test_runtime_caches_literal_operations():
+    runtime.reset_stats()
+    assert runtime.eval_binary_op(2, "mul", 3) == 6
+    assert runtime.eval_binary_op(2, "mul", 3) == 6
+    assert runtime.eval_binary_op(2.0, "mul", 3) == 6.0
+    assert runtime.eval_binary_op([2], "mul", 3) == [2, 2, 2]
+    assert runtime.stats() == {
+        "unary_ops": 0,
+        "binary_ops": 4,
+        "cache_hits": 1,
+        "cache_misses": 2,
+    }
+
+
+def test_runtime_keeps_signed_zeros():
+    assert str(runtime.eval_unary_op("neg", 0.0)) == "-0.0"
+    assert str(runtime.eval_unary_op("neg", -0.0)) == "0.0"
+    assert type(runtime.eval_unary_op("neg", True)) is int
+    assert type(runtime.eval_unary_op("not_", 1)) is bool
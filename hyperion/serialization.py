@@ -0,0 +1,110 @@
+import marshal
+
+from hyperion import ast
+from hyperion import transforms
+
+
+# Compact binary form of syntax trees, for loading them without parsing. Trees are
+# encoded as nested tuples of primitive values and written with marshal, which is
+# fast and, unlike pickle, never instantiates arbitrary classes: decoding only
+# builds the node types listed below.
+#
+# Every encoded tuple starts with a tag: _tuple_tag for plain tuples, _string_tag
+# for ast.String and the index in node_types plus _first_node_tag for the nodes.
+# Compiled constraints of preprocessed sweeps, transforms.Constraint, get
+# _constraint_tag and only store their expressions. Primitive values are stored
+# as they are. The order of node_types is part of the format, so new types should
+# only be appended, and format_version bumped on incompatible changes.
+
+format_version = 1
+
+node_types = (
+    ast.Config,
+    ast.Import,
+    ast.Include,
+    ast.Namespace,
+    ast.Binding,
+    ast.Identifier,
+    ast.Scope,
+    ast.With,
+    ast.Macro,
+    ast.Reference,
+    ast.UnaryOp,
+    ast.BinaryOp,
+    ast.Parenthesis,
+    ast.Dict,
+    ast.List,
+    ast.Tuple,
+    ast.Call,
+    ast.Sweep,
+    ast.All,
+    ast.Product,
+    ast.Union,
+    ast.Table,
+    ast.Header,
+    ast.Row,
+    ast.Where,
+    ast.ExternalTable,
+)
+
+_tuple_tag = 0
+_string_tag = 1
+_first_node_tag = 2
+_constraint_tag = -1
+_node_tags = {
+    node_type: tag for (tag, node_type) in enumerate(node_types, _first_node_tag)
+}
+_primitive_types = (bool, int, float, complex, str, type(None))
+
+
+def encode(tree):
+    if type(tree) in _node_tags:
+        return (_node_tags[type(tree)],) + tuple(map(encode, tree))
+    if type(tree) is tuple:
+        return (_tuple_tag,) + tuple(map(encode, tree))
+    if type(tree) is ast.String:
+        return (_string_tag, str(tree))
+    if type(tree) is transforms.Constraint:
+        if tree.decode is not None:
+            # Bound to the lines of a sweep template.
+            raise ValueError("Cannot serialize a constraint with decode.")
+        return (_constraint_tag, encode(tree.expr))
+    if type(tree) in _primitive_types:
+        return tree
+    raise ValueError(f"Cannot serialize a {type(tree).__name__}.")
+
+
+def decode(data):
+    if type(data) is tuple:
+        (tag, *fields) = data
+        if tag == _tuple_tag:
+            return tuple(map(decode, fields))
+        if tag == _string_tag:
+            (text,) = fields
+            return ast.String(text)
+        if tag == _constraint_tag:
+            (expr,) = fields
+            return transforms.Constraint(decode(expr))
+        if _first_node_tag <= tag < _first_node_tag + len(node_types):
+            return node_types[tag - _first_node_tag](*map(decode, fields))
+        raise ValueError(f"Unknown tag in serialized tree: {tag}.")
+    if type(data) in _primitive_types:
+        return data
+    raise ValueError(f"Unexpected {type(data).__name__} in serialized tree.")
+
+
+def dumps(tree):
+    return marshal.dumps((format_version, encode(tree)))
+
+
+def loads(data):
+    try:
+        (version, encoded) = marshal.loads(data)
+    except (EOFError, TypeError, ValueError):
+        raise ValueError("Malformed serialized tree.")
+    if version != format_version:
+        raise ValueError(
+            f"Unsupported serialization format version {version}, expected "
+            f"{format_version}."
+        )
+    return decode(encoded)
@@ -0,0 +1,43 @@
+import hypothesis as ht
+import pytest
+
+from hyperion import ast
+from hyperion import parsing
+from hyperion import serialization
+from hyperion import testing
+from hyperion import transforms
+
+
+@ht.given(testing.configs())
+def test_loads_inverses_dumps_for_configs(config):
+    assert serialization.loads(serialization.dumps(config)) == config
+
+
+@ht.given(testing.sweeps())
+def test_loads_inverses_dumps_for_sweeps(sweep):
+    assert serialization.loads(serialization.dumps(sweep)) == sweep
+
+
+def test_loads_preserves_strings():
+    tree = ast.Tuple(items=(ast.String("a"), "a", (1, 2.0, None)))
+    loaded_tree = serialization.loads(serialization.dumps(tree))
+    assert [type(item) for item in loaded_tree.items] == [ast.String, str, tuple]
+
+
+def test_dumps_rejects_other_objects():
+    with pytest.raises(ValueError):
+        serialization.dumps(ast.Tuple(items=(object(),)))
+
+
+def test_loads_rejects_other_versions():
+    with pytest.raises(ValueError):
+        serialization.loads(serialization.marshal.dumps((0, 1)))
+
+
+def test_loads_inverses_dumps_for_constraints():
+    expr = parsing.parse_expr("%m > 'a'")
+    constraint = serialization.loads(serialization.dumps(transforms.Constraint(expr)))
+    assert type(constraint) is transforms.Constraint
+    assert constraint.expr == expr
+    with pytest.raises(ValueError):
+        serialization.dumps(transforms.Constraint(expr, decode={}))
@@ -0,0 +1,98 @@
+import json
+import struct
+
+
+# Config streams, e.g. for piping the configs into a job scheduler:
+#
+# - nul: the configs separated by NUL bytes - they never contain one,
+# - length: every config preceded by its length in bytes, as a little-endian uint64,
+# - jsonl: one JSON object {"index": i, "text": config} per line.
+#
+# The configs are UTF-8 encoded in all formats.
+
+length_format = "<Q"
+
+
+def encode_nul(index, config):
+    return config.encode() + b"\0"
+
+
+def encode_length(index, config):
+    data = config.encode()
+    return struct.pack(length_format, len(data)) + data
+
+
+def encode_jsonl(index, config):
+    return (json.dumps({"index": index, "text": config}) + "\n").encode()
+
+
+encoders = {
+    "nul": encode_nul,
+    "length": encode_length,
+    "jsonl": encode_jsonl,
+}
+
+
+def write_stream(configs, f, format):
+    # Writes the configs to a binary file object, flushing after every one so the
+    # consumer can start on it right away. Returns the number of configs.
+    encode = encoders[format]
+    n_configs = 0
+    for (index, config) in enumerate(configs):
+        f.write(encode(index, config))
+        f.flush()
+        n_configs += 1
+    return n_configs
+
+
+def read_exactly(f, size):
+    data = f.read(size)
+    while len(data) < size:
+        chunk = f.read(size - len(data))
+        if not chunk:
+            raise ValueError("Truncated config stream.")
+        data += chunk
+    return data
+
+
+def decode_nul(f):
+    buffer = b""
+    while True:
+        chunk = f.read1(65536) if hasattr(f, "read1") else f.read(65536)
+        if not chunk:
+            break
+        buffer += chunk
+        *configs, buffer = buffer.split(b"\0")
+        for config in configs:
+            yield config.decode()
+    if buffer:
+        raise ValueError("Truncated config stream.")
+
+
+def decode_length(f):
+    length_size = struct.calcsize(length_format)
+    while True:
+        header = f.read(length_size)
+        if not header:
+            break
+        header += read_exactly(f, length_size - len(header))
+        (length,) = struct.unpack(length_format, header)
+        yield read_exactly(f, length).decode()
+
+
+def decode_jsonl(f):
+    for line in f:
+        yield json.loads(line)["text"]
+
+
+decoders = {
+    "nul": decode_nul,
+    "length": decode_length,
+    "jsonl": decode_jsonl,
+}
+
+
+def read_stream(f, format):
+    # Yields the configs from a binary file object written by write_stream, as
+    # soon as each one arrives.
+    return decoders[format](f)
@@ -0,0 +1,30 @@
+import io
+
+import hypothesis as ht
+from hypothesis import strategies as st
+import pytest
+
+from hyperion import stream
+
+
+configs_strategy = st.lists(
+    st.text(st.characters(blacklist_categories=("Cs",), blacklist_characters="\0"))
+)
+
+
+@pytest.mark.parametrize("format", sorted(stream.encoders))
+@ht.given(configs=configs_strategy)
+def test_read_stream_returns_written_configs(format, configs):
+    f = io.BytesIO()
+    assert stream.write_stream(iter(configs), f, format) == len(configs)
+    f.seek(0)
+    assert list(stream.read_stream(f, format)) == configs
+
+
+@pytest.mark.parametrize("format", ["nul", "length"])
+def test_read_stream_detects_truncation(format):
+    f = io.BytesIO()
+    stream.write_stream(["a.x = 1"], f, format)
+    truncated = io.BytesIO(f.getvalue()[:-1])
+    with pytest.raises(ValueError):
+        list(stream.read_stream(truncated, format))
@@ -1,4 +1,12 @@
+import builtins
+import collections
+import functools
+import hashlib
+import itertools
+import math
+
 from hyperion import ast
+from hyperion import tables
 from hyperion import transforms
 
 
@@ -20,20 +28,103 @@ def void():
     yield
 
 
+class Reiterable:
+    # Sweep generated again on every iteration, instead of materialized, e.g. one
+    # reading an external table. generate returns a new iterator of config dicts.
+
+    def __init__(self, generate):
+        self.generate = generate
+
+    def __iter__(self):
+        return iter(self.generate())
+
+
+def materialize(sweep):
+    # Makes a sweep iterable multiple times. Re-iterable sweeps stay lazy.
+    if type(sweep) is Reiterable:
+        return sweep
+    return list(sweep)
+
+
+def nested_product(seqs):
+    if not seqs:
+        yield ()
+        return
+
+    (first, *rest) = seqs
+    for item in first:
+        for rest_items in nested_product(rest):
+            yield (item,) + rest_items
+
+
+def product_of(seqs):
+    # itertools.product copies all its inputs, so with re-iterable sweeps we nest
+    # the loops ourselves.
+    if builtins.any(type(seq) is Reiterable for seq in seqs):
+        return nested_product(seqs)
+    return itertools.product(*seqs)
+
+
 def product(*sweeps):
     if not sweeps:
         yield from unit()
         return
 
+    # Materialize all sweeps but the first one, so we can iterate over them
+    # multiple times. Merging all parts of a config at once, instead of
+    # recursively, avoids building intermediate configs.
     (first, *rest) = sweeps
-    second = list(product(*rest))
+    rest = list(map(materialize, rest))
     for first_config_dict in first:
-        for second_config_dict in second:
+        for rest_config_dicts in product_of(rest):
             total_config_dict = first_config_dict.copy()
-            total_config_dict.update(second_config_dict)
+            for config_dict in rest_config_dicts:
+                total_config_dict.update(config_dict)
             yield total_config_dict
 
 
+def constrained_product(sweeps, constraints):
+    # Product of sweeps filtered by constraints, given as pairs (level, constraint).
+    # A constraint is checked once the first `level` sweeps are merged, so the
+    # configs violating it are pruned before enumerating the rest of the product.
+    levels = sorted({level for (level, _) in constraints} | {len(sweeps)})
+    level_to_constraints = collections.defaultdict(list)
+    for (level, constraint) in constraints:
+        level_to_constraints[level].append(constraint)
+
+    # Like in product, keep the first sweep lazy.
+    sweeps = list(sweeps[:1]) + list(map(materialize, sweeps[1:]))
+
+    def extend(config_dict, start, level_index):
+        stop = levels[level_index]
+        if start == 0 and stop > 0:
+            parts_seq = (
+                (first_config_dict,) + rest_config_dicts
+                for first_config_dict in sweeps[0]
+                for rest_config_dicts in product_of(sweeps[1:stop])
+            )
+        else:
+            parts_seq = product_of(sweeps[start:stop])
+
+        for parts in parts_seq:
+            total_config_dict = config_dict.copy()
+            for part in parts:
+                total_config_dict.update(part)
+
+            if not builtins.all(
+                constraint(total_config_dict)
+                for constraint in level_to_constraints[stop]
+            ):
+                continue
+
+            if level_index + 1 == len(levels):
+                yield total_config_dict
+            else:
+                yield from extend(total_config_dict, stop, level_index + 1)
+
+    yield from extend({}, 0, 0)
+
+
 def union(*sweeps):
     for sweep in sweeps:
         yield from sweep
@@ -45,29 +136,378 @@ def table(names, value_seqs):
         yield dict(zip(names, value_seq))
 
 
-def generate_configs(sweep_tree):
-    def generate_from_node(node):
-        def from_product():
-            return product(*node.statements)
+def table_source(source):
+    # The source of an ast.ExternalTable is the path of the file, or a
+    # tables.TableSource in sweep templates.
+    if type(source) is tables.TableSource:
+        return source
+    return tables.TableSource(str(source))
+
+
+def external_table(names, source):
+    yield from table_source(source).config_dicts(names)
+
+
+def has_external_table(node):
+    if type(node) is ast.ExternalTable:
+        return True
+    return builtins.any(map(has_external_table, getattr(node, "statements", ())))
 
-        def from_table():
-            rows = tuple(row.exprs for row in node.rows)
-            return table(node.header.identifiers, rows)
 
+def config_fingerprint(config_dict):
+    # Configs are equal regardless of the order of their bindings, so we sort them
+    # by identifier. Identifiers are unique within a config, so the values never
+    # get compared. repr distinguishes the types of the values, e.g. 1 and True.
+    canonical = repr(sorted(config_dict.items()))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+
+# Set of fingerprints with bounded memory and a small false positive rate. False
+# positives mean that some unique configs may be dropped, so this should only be
+# used for sweeps too big to fit the exact fingerprint set in memory.
+class BloomFilter:
+    def __init__(self, capacity=(10**7), error_rate=1e-6):
+        n_bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.n_bits = max(n_bits, 8)
+        self.n_hashes = max(round(self.n_bits / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.n_bits + 7) // 8)
+
+    def _indices(self, fingerprint):
+        # Double hashing - derive all indices from two halves of the fingerprint.
+        h1 = int.from_bytes(fingerprint[:8], "little")
+        h2 = int.from_bytes(fingerprint[8:], "little") | 1
+        for i in range(self.n_hashes):
+            yield (h1 + i * h2) % self.n_bits
+
+    def add(self, fingerprint):
+        for index in self._indices(fingerprint):
+            self.bits[index >> 3] |= 1 << (index & 7)
+
+    def __contains__(self, fingerprint):
+        # all() is shadowed by the sweep function in this module.
+        return builtins.all(
+            self.bits[index >> 3] & (1 << (index & 7))
+            for index in self._indices(fingerprint)
+        )
+
+
+dedupe_modes = {
+    "exact": set,
+    "bloom": BloomFilter,
+}
+
+
+def make_fingerprint_set(dedupe, sweep_tree):
+    # The default capacity of Bloom filters takes tens of MB, so when we can count
+    # the configs of the sweep without reading files, we size the filter for them.
+    if dedupe not in dedupe_modes:
+        raise ValueError(f"Unknown dedupe mode: {dedupe}.")
+    if dedupe == "bloom" and not has_external_table(sweep_tree):
+        n_configs = config_counts(sweep_tree)[id(sweep_tree)]
+        if n_configs is not None:
+            return BloomFilter(capacity=max(n_configs, 1))
+    return dedupe_modes[dedupe]()
+
+
+def deduplicate(config_dicts, fingerprints):
+    for config_dict in config_dicts:
+        fingerprint = config_fingerprint(config_dict)
+        if fingerprint in fingerprints:
+            continue
+        fingerprints.add(fingerprint)
+        yield config_dict
+
+
+def bound_identifiers(sweep_tree):
+    identifiers = set()
+
+    def collect_from_node(node):
+        if type(node) is ast.All:
+            identifiers.add(node.identifier)
+        if type(node) is ast.Header:
+            identifiers.update(node.identifiers)
+        return node
+
+    transforms.fold(collect_from_node, sweep_tree)
+    return identifiers
+
+
+def split_constraints(block):
+    constraints = tuple(
+        statement.expr for statement in block.statements if type(statement) is ast.Where
+    )
+    statements = tuple(
+        statement for statement in block.statements if type(statement) is not ast.Where
+    )
+    return (constraints, statements)
+
+
+def generate_config_dicts(sweep_tree, dedupe=None):
+    def generate_reiterable(node):
+        # External tables are read again instead of materialized in products, to
+        # keep the memory bounded.
+        if has_external_table(node):
+            return Reiterable(lambda: generate_from_node(node))
+        return generate_from_node(node)
+
+    def from_product(node):
+        (constraints, statements) = split_constraints(node)
+        sweeps = tuple(map(generate_reiterable, statements))
+        if not constraints:
+            return product(*sweeps)
+
+        # Check every constraint right after the last statement that can bind any
+        # of the identifiers it references.
+        identifier_sets = tuple(map(bound_identifiers, statements))
+
+        def constraint_level(constraint):
+            levels = [
+                index + 1
+                for (index, identifiers) in enumerate(identifier_sets)
+                if identifiers & constraint.identifiers
+            ]
+            return max(levels, default=0)
+
+        leveled_constraints = tuple(
+            (constraint_level(constraint), constraint) for constraint in constraints
+        )
+        return constrained_product(sweeps, leveled_constraints)
+
+    def from_union(node):
+        (constraints, statements) = split_constraints(node)
+        config_dicts = union(*map(generate_from_node, statements))
+        if not constraints:
+            return config_dicts
+
+        return (
+            config_dict
+            for config_dict in config_dicts
+            if builtins.all(constraint(config_dict) for constraint in constraints)
+        )
+
+    def from_table(node):
+        rows = tuple(row.exprs for row in node.rows)
+        return table(node.header.identifiers, rows)
+
+    def from_external_table(node):
+        return external_table(node.header.identifiers, node.source)
+
+    def generate_from_node(node):
         gen_map = {
-            ast.All: lambda: all(*node),
+            ast.All: lambda node: all(*node),
             ast.Product: from_product,
-            ast.Union: lambda: union(*node.statements),
+            ast.Union: from_union,
             ast.Table: from_table,
+            ast.ExternalTable: from_external_table,
             ast.Sweep: from_product,
         }
-        if type(node) in gen_map:
-            return gen_map[type(node)]()
+        return gen_map[type(node)](node)
+
+    config_dicts = generate_from_node(sweep_tree)
+
+    if dedupe is not None:
+        # Either a mode name or a set-like object for storing the fingerprints.
+        if type(dedupe) is str:
+            dedupe = make_fingerprint_set(dedupe, sweep_tree)
+        config_dicts = deduplicate(config_dicts, dedupe)
+
+    return config_dicts
+
+
+# Random access:
+# ==============
+
+
+def config_counts(sweep_tree):
+    # Maps the ids of the nodes to the numbers of configs they generate. Subtrees
+    # with constraints get None, because we can't count them without generating.
+    counts = {}
+
+    def count(node):
+        if type(node) is ast.All:
+            n_configs = len(node.exprs)
+        elif type(node) is ast.Table:
+            n_configs = len(node.rows)
+        elif type(node) is ast.ExternalTable:
+            # Reads the file, but doesn't keep the rows.
+            n_configs = table_source(node.source).count()
+        else:
+            (constraints, statements) = split_constraints(node)
+            child_counts = [count(statement) for statement in statements]
+            if constraints or None in child_counts:
+                n_configs = None
+            elif type(node) is ast.Union:
+                n_configs = sum(child_counts)
+            else:
+                n_configs = math.prod(child_counts)
+
+        counts[id(node)] = n_configs
+        return n_configs
+
+    count(sweep_tree)
+    return counts
+
+
+def count_configs(sweep_tree):
+    n_configs = config_counts(sweep_tree)[id(sweep_tree)]
+    if n_configs is None:
+        n_configs = sum(1 for _ in generate_config_dicts(sweep_tree))
+    return n_configs
+
+
+def generate_config_dicts_from(sweep_tree, start, counts):
+    # Generates the config dicts starting from the given index, in the order of
+    # generate_config_dicts, without generating the preceding ones. Requires the
+    # counts from config_counts - no constraints in the sweep.
+    if type(sweep_tree) is ast.All:
+        for expr in sweep_tree.exprs[start:]:
+            yield {sweep_tree.identifier: expr}
+        return
+
+    if type(sweep_tree) is ast.Table:
+        rows = tuple(row.exprs for row in sweep_tree.rows[start:])
+        yield from table(sweep_tree.header.identifiers, rows)
+        return
+
+    if type(sweep_tree) is ast.ExternalTable:
+        config_dicts = external_table(sweep_tree.header.identifiers, sweep_tree.source)
+        yield from itertools.islice(config_dicts, start, None)
+        return
+
+    if type(sweep_tree) is ast.Union:
+        for statement in sweep_tree.statements:
+            n_configs = counts[id(statement)]
+            if start < n_configs:
+                yield from generate_config_dicts_from(statement, start, counts)
+                start = 0
+            else:
+                start -= n_configs
+        return
+
+    # Product - the index is a mixed-radix number with the last statement as the
+    # least significant digit.
+    if not sweep_tree.statements:
+        if start == 0:
+            yield from unit()
+        return
+
+    (first, *rest) = sweep_tree.statements
+    n_rest_configs = math.prod(counts[id(statement)] for statement in rest)
+    if n_rest_configs == 0:
+        return
+
+    (first_start, rest_start) = divmod(start, n_rest_configs)
+    rest = [
+        Reiterable(functools.partial(generate_config_dicts_from, statement, 0, counts))
+        if has_external_table(statement)
+        else list(generate_config_dicts_from(statement, 0, counts))
+        for statement in rest
+    ]
+    for first_config_dict in generate_config_dicts_from(first, first_start, counts):
+        rest_config_dict_seqs = product_of(rest)
+        if rest_start:
+            # Only for the first config of the first statement.
+            rest_config_dict_seqs = itertools.islice(
+                rest_config_dict_seqs, rest_start, None
+            )
+            rest_start = 0
+
+        for rest_config_dicts in rest_config_dict_seqs:
+            total_config_dict = first_config_dict.copy()
+            for config_dict in rest_config_dicts:
+                total_config_dict.update(config_dict)
+            yield total_config_dict
+
+
+def slice_config_dicts(sweep_tree, start, stop):
+    counts = config_counts(sweep_tree)
+    if counts[id(sweep_tree)] is None:
+        # Fall back to generating from the beginning.
+        config_dicts = generate_config_dicts(sweep_tree)
+    else:
+        config_dicts = generate_config_dicts_from(sweep_tree, start, counts)
+        (start, stop) = (0, stop - start)
+
+    return itertools.islice(config_dicts, start, stop)
+
+
+def invariant_bindings(sweep_tree):
+    # Computes the bindings that have the same value in every config of the sweep,
+    # based on its structure. Every node is mapped to a pair (invariant, bound),
+    # where invariant is a dict of the bindings shared by all configs in the
+    # subtree and bound is the set of identifiers bound by any of them.
+
+    def same(exprs):
+        # repr distinguishes the types of the values, e.g. 1 and True.
+        return len(set(map(repr, exprs))) == 1
+
+    def from_product(node):
+        invariant = {}
+        bound = set()
+        (_, statements) = split_constraints(node)
+        for (child_invariant, child_bound) in statements:
+            # Bindings in later statements override the earlier ones.
+            for identifier in child_bound:
+                if identifier in child_invariant:
+                    invariant[identifier] = child_invariant[identifier]
+                else:
+                    invariant.pop(identifier, None)
+            bound |= child_bound
+        return (invariant, bound)
+
+    def from_union(node):
+        # Constraints can only make more bindings invariant, so we ignore them.
+        (_, statements) = split_constraints(node)
+        if not statements:
+            return ({}, set())
+
+        invariants = [child_invariant for (child_invariant, _) in statements]
+        invariant = {
+            identifier: expr
+            for (identifier, expr) in invariants[0].items()
+            if builtins.all(identifier in other for other in invariants)
+            and same([other[identifier] for other in invariants])
+        }
+        bound = set().union(*(child_bound for (_, child_bound) in statements))
+        return (invariant, bound)
+
+    def from_all(node):
+        invariant = {node.identifier: node.exprs[0]} if same(node.exprs) else {}
+        return (invariant, {node.identifier})
+
+    def from_table(node):
+        identifiers = node.header.identifiers
+        columns = zip(*(row.exprs for row in node.rows))
+        invariant = {
+            identifier: column[0]
+            for (identifier, column) in zip(identifiers, columns)
+            if same(column)
+        }
+        return (invariant, set(identifiers))
+
+    def from_external_table(node):
+        # We don't read the file just for this.
+        return ({}, set(node.header.identifiers))
+
+    def invariant_from_node(node):
+        invariant_map = {
+            ast.All: from_all,
+            ast.Product: from_product,
+            ast.Union: from_union,
+            ast.Table: from_table,
+            ast.ExternalTable: from_external_table,
+            ast.Sweep: from_product,
+        }
+        if type(node) in invariant_map:
+            return invariant_map[type(node)](node)
         else:
             return node
 
-    config_dicts = transforms.fold(generate_from_node, sweep_tree)
+    (invariant, _) = transforms.fold(invariant_from_node, sweep_tree)
+    return invariant
+
 
+def generate_configs(sweep_tree, dedupe=None):
     def config_dict_to_config(config_dict):
         return ast.Config(
             statements=tuple(
@@ -76,4 +516,4 @@ def generate_configs(sweep_tree):
             )
         )
 
-    return map(config_dict_to_config, config_dicts)
+    return map(config_dict_to_config, generate_config_dicts(sweep_tree, dedupe))
@@ -1,3 +1,4 @@
+import builtins
 import collections
 import functools
 import operator
@@ -112,6 +113,14 @@ def test_product_uniqueness(sweep_list):
     assert len(product_sweep) == len(freeze_sweep(product_sweep))
 
 
+@ht.given(sweep_lists())
+def test_product_of_reiterable_sweeps_equals_product_of_lists(sweep_list):
+    reiterable_sweeps = [
+        sweeps.Reiterable(functools.partial(iter, sweep)) for sweep in sweep_list
+    ]
+    assert list(sweeps.product(*reiterable_sweeps)) == list(sweeps.product(*sweep_list))
+
+
 @ht.given(sweep_lists(allow_empty=False).filter(disjoint_names))
 def test_product_completeness(sweep_list):
     product_sweep = sweeps.product(*sweep_list)
@@ -163,3 +172,143 @@ def test_generate_configs_produces_gin_parsable_output(sweep):
     preprocessed_sweep = transforms.preprocess_sweep(sweep, with_partial_eval=False)
     for config in sweeps.generate_configs(preprocessed_sweep):
         testing.try_to_parse_config_using_gin(config)
+
+
+@pytest.mark.parametrize("dedupe", ["exact", "bloom"])
+@ht.given(sweep_lists())
+def test_deduplicate_removes_duplicates_from_union(dedupe, sweep_list):
+    union_sweep = list(sweeps.union(*sweep_list))
+    dedupe = set() if dedupe == "exact" else sweeps.BloomFilter(capacity=1000)
+    deduped_sweep = list(sweeps.deduplicate(union_sweep, dedupe))
+    assert len(deduped_sweep) == len(freeze_sweep(deduped_sweep))
+    assert freeze_sweep(deduped_sweep) == freeze_sweep(union_sweep)
+
+
+@ht.given(st.dictionaries(keys=st.integers(), values=st.integers()))
+def test_config_fingerprint_ignores_binding_order(config_dict):
+    reversed_config_dict = dict(reversed(list(config_dict.items())))
+    assert sweeps.config_fingerprint(config_dict) == sweeps.config_fingerprint(
+        reversed_config_dict
+    )
+
+
+def test_config_fingerprint_distinguishes_value_types():
+    assert sweeps.config_fingerprint({"x": 1}) != sweeps.config_fingerprint({"x": True})
+
+
+def test_generate_configs_dedupes_overlapping_union_branches():
+    a = transforms.make_identifier(("f",), "a")
+    b = transforms.make_identifier(("f",), "b")
+    sweep = ast.Sweep(
+        statements=(
+            ast.Union(
+                statements=(
+                    ast.Product(statements=(ast.All(a, (1,)), ast.All(b, (1, 2)))),
+                    ast.Product(statements=(ast.All(b, (1,)), ast.All(a, (1, 2)))),
+                )
+            ),
+        )
+    )
+    assert len(list(sweeps.generate_configs(sweep))) == 4
+    assert len(list(sweeps.generate_configs(sweep, dedupe="exact"))) == 3
+    assert len(list(sweeps.generate_configs(sweep, dedupe="bloom"))) == 3
+    # The Bloom filter is sized for the 4 configs.
+    assert sweeps.make_fingerprint_set("bloom", sweep).n_bits < 1000
+
+
+def test_invariant_bindings_follow_sweep_structure():
+    (a, b, c, d) = (transforms.make_identifier(("f",), name) for name in "abcd")
+    sweep = ast.Sweep(
+        statements=(
+            ast.All(a, (1,)),
+            ast.All(b, (1,)),
+            ast.Union(
+                statements=(
+                    ast.Product(statements=(ast.All(c, (1,)), ast.All(d, (1,)))),
+                    ast.Table(
+                        header=ast.Header(identifiers=(c, d)),
+                        rows=(ast.Row(exprs=(1, True)), ast.Row(exprs=(1, True))),
+                    ),
+                )
+            ),
+            ast.All(b, (1, 2)),
+        )
+    )
+    assert sweeps.invariant_bindings(sweep) == {a: 1, c: 1}
+
+
+class CountingConstraint:
+    def __init__(self, predicate, identifiers=()):
+        self.predicate = predicate
+        self.identifiers = set(identifiers)
+        self.n_calls = 0
+
+    def __call__(self, config_dict):
+        self.n_calls += 1
+        return self.predicate(config_dict)
+
+
+@ht.given(sweep_lists())
+def test_constrained_product_equals_filtered_product(sweep_list):
+    def predicate(config_dict):
+        return sum(config_dict.values()) % 2 == 0
+
+    constrained_sweep = sweeps.constrained_product(
+        sweep_list, [(len(sweep_list), predicate)]
+    )
+    filtered_sweep = filter(predicate, sweeps.product(*sweep_list))
+    assert list(constrained_sweep) == list(filtered_sweep)
+
+
+def make_sweep_with_constraint(constraint):
+    (a, b, c) = (transforms.make_identifier((), name) for name in "abc")
+    return ast.Sweep(
+        statements=(
+            ast.All(a, (1, 2, 3)),
+            ast.All(b, (1, 2, 3)),
+            ast.Where(constraint),
+            ast.All(c, (1, 2, 3)),
+        )
+    )
+
+
+def test_generate_configs_prunes_product_early():
+    (a, b) = (transforms.make_identifier((), name) for name in "ab")
+    constraint = CountingConstraint(
+        lambda config_dict: config_dict[a] <= config_dict[b], identifiers=(a, b)
+    )
+    sweep = make_sweep_with_constraint(constraint)
+    config_dicts = list(sweeps.generate_config_dicts(sweep))
+    assert len(config_dicts) == 6 * 3
+    assert builtins.all(
+        config_dict[a] <= config_dict[b] for config_dict in config_dicts
+    )
+    # Checked once for every pair of a and b, not for every config.
+    assert constraint.n_calls == 3 * 3
+
+
+def test_constraint_evaluates_macros():
+    constraint = transforms.Constraint(
+        ast.BinaryOp(ast.Macro("a"), "lt", ast.Macro("b"))
+    )
+    sweep = make_sweep_with_constraint(constraint)
+    assert len(list(sweeps.generate_configs(sweep))) == 3 * 3
+
+
+def test_constraint_raises_on_unbound_macro():
+    sweep = make_sweep_with_constraint(transforms.Constraint(ast.Macro("d")))
+    with pytest.raises(ValueError):
+        list(sweeps.generate_configs(sweep))
+
+
+@ht.settings(deadline=None)
+@ht.given(testing.sweeps(with_imports=False, with_includes=False), st.data())
+def test_slice_config_dicts_equals_slice_of_generated(sweep, data):
+    preprocessed_sweep = transforms.preprocess_sweep(sweep, with_partial_eval=False)
+    config_dicts = list(sweeps.generate_config_dicts(preprocessed_sweep))
+    assert sweeps.count_configs(preprocessed_sweep) == len(config_dicts)
+
+    start = data.draw(st.integers(min_value=0, max_value=len(config_dicts)))
+    stop = data.draw(st.integers(min_value=start, max_value=(len(config_dicts) + 1)))
+    sliced_config_dicts = sweeps.slice_config_dicts(preprocessed_sweep, start, stop)
+    assert list(sliced_config_dicts) == config_dicts[start:stop]
@@ -0,0 +1,272 @@
+import csv
+import functools
+import hashlib
+import os
+import re
+
+import lark
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from hyperion import ast
+from hyperion import parsing
+from hyperion import transforms
+
+
+# External tables: `table a, b from 'rows.csv'` reads the rows from a file during
+# generation, one at a time, instead of parsing them together with the sweep.
+# Supported files:
+#
+# - .csv with a header row naming the columns,
+# - .npy with a 2D array, with the columns in the order of the table header, or a
+#   structured array with named fields. Arrays are memory-mapped.
+# - .npz with a 1D array per column. Members of .npz files can't be
+#   memory-mapped, so the used columns are loaded when the table is read.
+#
+# Columns are matched to the identifiers by the rendered identifier, e.g.
+# "scope/model.lr", or by a suffix of it, e.g. "model.lr" or "lr". CSV cells are
+# expressions, like in inline tables, so strings need quotes, e.g. 'adam' or
+# """adam""" - CSV removes one level of double quotes. Numbers, simple quoted
+# strings, booleans and None take a fast path, without the expression parser.
+
+_int_pattern = re.compile(r"[-+]?[0-9]+\Z")
+_float_pattern = re.compile(
+    r"[-+]?([0-9]+\.[0-9]*|\.[0-9]+|[0-9]+)([eE][-+]?[0-9]+)?\Z"
+)
+_constants = {"True": True, "False": False, "None": None}
+
+
+def parse_literal(text):
+    # Returns a pair (is_literal, expr).
+    if text in _constants:
+        return (True, _constants[text])
+    if _int_pattern.match(text):
+        return (True, int(text))
+    if _float_pattern.match(text):
+        return (True, float(text))
+    (quote, inner) = (text[:1], text[1:-1])
+    if (
+        len(text) >= 2
+        and quote in ("'", '"')
+        and text.endswith(quote)
+        and quote not in inner
+        and "\\" not in inner
+    ):
+        return (True, ast.String(inner))
+    return (False, None)
+
+
+def parse_cell(text):
+    # Returns a pair (is_literal, expr). Expressions other than literals are
+    # partially evaluated, like in transforms.preprocess_sweep.
+    text = text.strip()
+    (is_literal, expr) = parse_literal(text)
+    if is_literal:
+        return (True, expr)
+    return (False, _parse_expr_cell(text))
+
+
+# Tables are read again for every config of the statements before them, so the
+# parsed expressions are cached.
+
+
+@functools.lru_cache(maxsize=2**16)
+def _parse_expr_cell(text):
+    return transforms.partial_eval(parsing.parse_expr(text))
+
+
+def cell_cache_info():
+    return _parse_expr_cell.cache_info()
+
+
+def clear_cell_cache():
+    _parse_expr_cell.cache_clear()
+
+
+def value_to_expr(value):
+    if np is not None and isinstance(value, np.generic):
+        value = value.item()
+    if type(value) is bytes:
+        value = value.decode()
+    if type(value) is str:
+        return ast.String(value)
+    return value
+
+
+def column_names(identifier):
+    # Names the column of an identifier can have, from the most specific one.
+    path = identifier.namespace.path + (identifier.name,)
+    names = [".".join(path[start:]) for start in range(len(path))]
+    if identifier.scope.path:
+        names.insert(0, "/".join(identifier.scope.path) + "/" + names[0])
+    return names
+
+
+def match_columns(identifiers, columns, path):
+    # Returns the index of the column of every identifier.
+    column_indices = {column.strip(): index for (index, column) in enumerate(columns)}
+    indices = []
+    for identifier in identifiers:
+        names = column_names(identifier)
+        matches = [column_indices[name] for name in names if name in column_indices]
+        if not matches:
+            raise ValueError(f"Found no column for {names[0]} in {path}.")
+        indices.append(matches[0])
+    return indices
+
+
+def _read_csv(path, identifiers):
+    # Yields the rows as tuples of pairs (is_literal, expr), like the other readers.
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader, None)
+        if columns is None:
+            raise ValueError(f"Missing the header row in {path}.")
+        indices = match_columns(identifiers, columns, path)
+
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(columns):
+                raise ValueError(
+                    "Found a row with an inconsistent number of columns in "
+                    f"{path}, line {reader.line_num}."
+                )
+            cells = []
+            for index in indices:
+                try:
+                    cells.append(parse_cell(row[index]))
+                except lark.exceptions.LarkError as e:
+                    raise ValueError(
+                        f"Invalid value {row[index]!r} in {path}, line "
+                        f"{reader.line_num}."
+                    ) from e
+            yield tuple(cells)
+
+
+def _count_csv(path):
+    with open(path, newline="") as f:
+        return max(sum(1 for row in csv.reader(f) if row) - 1, 0)
+
+
+def _read_npy(path, identifiers):
+    array = np.load(path, mmap_mode="r")
+    if array.dtype.names is not None:
+        indices = match_columns(identifiers, array.dtype.names, path)
+        fields = [array.dtype.names[index] for index in indices]
+        rows = (tuple(record[field] for field in fields) for record in array)
+    elif array.ndim == 2 and array.shape[1] == len(identifiers):
+        rows = array
+    else:
+        raise ValueError(
+            f"Expected a 2D array with {len(identifiers)} columns or a structured "
+            f"array in {path}, got shape {array.shape}."
+        )
+
+    for row in rows:
+        yield tuple((True, value_to_expr(value)) for value in row)
+
+
+def _count_npy(path):
+    return len(np.load(path, mmap_mode="r"))
+
+
+def _read_npz(path, identifiers):
+    with np.load(path) as npz:
+        indices = match_columns(identifiers, npz.files, path)
+        columns = [npz[npz.files[index]] for index in indices]
+    if len({len(column) for column in columns}) > 1:
+        raise ValueError(f"Found columns of different lengths in {path}.")
+
+    for row in zip(*columns):
+        yield tuple((True, value_to_expr(value)) for value in row)
+
+
+def _count_npz(path):
+    with np.load(path) as npz:
+        return len(npz[npz.files[0]]) if npz.files else 0
+
+
+readers = {".csv": _read_csv, ".npy": _read_npy, ".npz": _read_npz}
+counters = {".csv": _count_csv, ".npy": _count_npy, ".npz": _count_npz}
+
+
+def _file_type(path):
+    (_, extension) = os.path.splitext(path)
+    extension = extension.lower()
+    if extension not in readers:
+        raise ValueError(
+            f"Unsupported external table {path}, expected one of: "
+            + ", ".join(sorted(readers))
+            + "."
+        )
+    if extension != ".csv" and np is None:
+        raise ImportError(f"Reading {extension} tables requires NumPy.")
+    return extension
+
+
+def _scope_prefix(identifiers):
+    # Scopes of the arguments hoisted from the cells. They are unique per table, so
+    # they don't collide with the ones from the rest of the sweep, and stable, so
+    # the generated configs are reproducible.
+    digest = hashlib.blake2b(repr(identifiers).encode(), digest_size=4).hexdigest()
+    return f"_t{digest}_"
+
+
+def read_table(path, identifiers):
+    # Yields the config dicts of the rows, reading the file lazily. Cells with
+    # expressions are preprocessed like the sweep, with the arguments of calls
+    # hoisted into extra bindings.
+    rows = readers[_file_type(path)](path, identifiers)
+    scope_prefix = _scope_prefix(identifiers)
+    for cells in rows:
+        config_dict = {
+            identifier: expr for (identifier, (_, expr)) in zip(identifiers, cells)
+        }
+        if not all(is_literal for (is_literal, _) in cells):
+            config = ast.Config(
+                statements=tuple(
+                    ast.Binding(identifier=identifier, expr=expr)
+                    for (identifier, expr) in config_dict.items()
+                )
+            )
+            config = transforms.expressions_to_calls(config)
+            config = transforms.calls_to_evaluated_references(config, scope_prefix)
+            config_dict = {
+                statement.identifier: statement.expr for statement in config.statements
+            }
+        yield config_dict
+
+
+def count_rows(path):
+    return counters[_file_type(path)](path)
+
+
+class TableSource:
+    # File of an external table in a sweep being generated. It's not an AST node,
+    # so fold treats it as a leaf. convert maps the identifier and the expression
+    # of every binding to the value in the config dicts, e.g. the rendered line in
+    # sweep templates.
+
+    def __init__(self, path, convert=None):
+        self.path = path
+        self.convert = convert
+
+    def config_dicts(self, identifiers):
+        config_dicts = read_table(self.path, identifiers)
+        if self.convert is None:
+            return config_dicts
+
+        return (
+            {
+                identifier: self.convert(identifier, expr)
+                for (identifier, expr) in config_dict.items()
+            }
+            for config_dict in config_dicts
+        )
+
+    def count(self):
+        return count_rows(self.path)
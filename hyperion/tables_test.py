@@ -0,0 +1,230 @@
+import csv
+import math
+import string
+
+import hypothesis as ht
+from hypothesis import strategies as st
+import pytest
+
+from hyperion import ast
+from hyperion import e2e
+from hyperion import evaluation
+from hyperion import parsing
+from hyperion import rendering
+from hyperion import sweeps
+from hyperion import tables
+from hyperion import transforms
+
+
+literals = st.one_of(
+    st.integers(),
+    st.floats(allow_nan=False, allow_infinity=False),
+    st.booleans(),
+    st.none(),
+    # Strings with escapes go through the parser.
+    st.text(string.ascii_letters + string.digits + " .,_-").map(ast.String),
+)
+
+
+@ht.given(literals)
+def test_parse_literal_agrees_with_the_parser(value):
+    (text, _) = rendering.render(value)
+    parsed = transforms.partial_eval(parsing.parse_expr(text))
+    assert tables.parse_literal(text) == (True, parsed)
+    assert type(parsed) is type(value)
+    assert parsed == value or math.isnan(value)
+
+
+@pytest.mark.parametrize("text", ["%m", "[1, 2]", "@f(x=1)", "'a\\'b'", "1 + 2"])
+def test_parse_cell_falls_back_to_the_parser(text):
+    assert tables.parse_literal(text) == (False, None)
+    assert tables.parse_cell(text) == (
+        False,
+        transforms.partial_eval(parsing.parse_expr(text)),
+    )
+
+
+header = ("f.a", "b", "c")
+rows = [
+    ("1", "2.5", "'x'"),
+    ("-3", "%m * 2", "[1, 'y']"),
+    ("True", "None", "@g()"),
+]
+
+
+def inline_table(indent=""):
+    lines = [f"table {', '.join(header)}:"]
+    lines += ["    " + ", ".join(row) for row in rows]
+    return "\n".join(indent + line for line in lines)
+
+
+def external_table(path, indent=""):
+    return f"{indent}table ({', '.join(header)}) from '{path}'"
+
+
+def write_csv(path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+sweep_templates = [
+    "m = 3\n{table}",
+    "m = 3\nproduct:\n    x: [1, 2]\n{indented_table}\n    y: [3, 4]",
+    "m = 3\nunion:\n    x: [1, 2]\n{indented_table}",
+    "m: [1, 2]\nwith s:\n{indented_table}\n    where %m > 1",
+]
+
+
+@pytest.mark.parametrize("template", sweep_templates)
+def test_external_csv_table_equals_inline_table(tmp_path, monkeypatch, template):
+    monkeypatch.chdir(tmp_path)
+    write_csv("rows.csv")
+
+    def make_sweep(make_table):
+        return template.format(
+            table=make_table(), indented_table=make_table(indent="    ")
+        )
+
+    inline_sweep = make_sweep(inline_table)
+    external_sweep = make_sweep(lambda **kwargs: external_table("rows.csv", **kwargs))
+    # Inline tables hoist the arguments of all rows into every config, so we
+    # compare the evaluated configs.
+    assert list(evaluation.evaluate_sweep(external_sweep)) == list(
+        evaluation.evaluate_sweep(inline_sweep)
+    )
+
+
+def test_arguments_are_hoisted_from_the_cells(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("rows.csv", "w") as f:
+        f.write('a\n"@g(z=%m + 1)"\n')
+
+    [config] = evaluation.evaluate_sweep("m = 3\ntable a from 'rows.csv'")
+    assert config == {
+        "m": 3,
+        "a": evaluation.SymbolicReference("g", evaluated=True, arguments=(("z", 4),)),
+    }
+    # The generated configs bind the hoisted arguments.
+    [rendered_config] = e2e.parse_sweep("m = 3\ntable a from 'rows.csv'")
+    assert "/g.z = " in rendered_config
+
+
+def test_columns_are_matched_by_the_identifier_suffixes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("rows.csv", "w") as f:
+        f.write("unused,lr,s/model.layers\n0,0.1,2\n0,0.2,3\n")
+
+    sweep = "with model:\n    table (s/layers, lr) from 'rows.csv'"
+    assert list(e2e.parse_sweep(sweep)) == [
+        "s/model.layers = 2\nmodel.lr = 0.1",
+        "s/model.layers = 3\nmodel.lr = 0.2",
+    ]
+
+
+def test_npy_and_npz_tables(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    monkeypatch.chdir(tmp_path)
+    np.save("plain.npy", np.array([[1, 2], [3, 4]]))
+    structured = np.array([(0.5, "u"), (1.5, "v")], dtype=[("a", "f8"), ("b", "U1")])
+    np.save("structured.npy", structured)
+    np.savez("columns.npz", b=np.array(["u", "v"]), a=np.array([0.5, 1.5]))
+
+    assert list(e2e.parse_sweep("table (x, y) from 'plain.npy'")) == [
+        "x = 1\ny = 2",
+        "x = 3\ny = 4",
+    ]
+    for path in ("structured.npy", "columns.npz"):
+        assert list(e2e.parse_sweep(f"table (f.a, f.b) from '{path}'")) == [
+            "f.a = 0.5\nf.b = 'u'",
+            "f.a = 1.5\nf.b = 'v'",
+        ]
+
+
+def test_slices_of_external_tables(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_csv("rows.csv")
+    (sweep, _) = e2e.parse_and_preprocess_sweep(
+        "m = 1\nx: [1, 2]\n" + external_table("rows.csv") + "\ny: [3, 4]"
+    )
+    config_dicts = list(sweeps.generate_config_dicts(sweep))
+    assert sweeps.count_configs(sweep) == len(config_dicts) == 12
+    for start in range(len(config_dicts)):
+        for stop in range(start, len(config_dicts) + 1):
+            assert (
+                list(sweeps.slice_config_dicts(sweep, start, stop))
+                == config_dicts[start:stop]
+            )
+
+
+def test_external_tables_are_not_materialized_in_products(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_csv("rows.csv")
+    (sweep, _) = e2e.parse_and_preprocess_sweep(
+        "m = 1\nx: [1, 2, 3]\n" + external_table("rows.csv")
+    )
+    n_reads = 0
+    read_table = tables.read_table
+
+    def counting_read_table(*args):
+        nonlocal n_reads
+        n_reads += 1
+        return read_table(*args)
+
+    monkeypatch.setattr(tables, "read_table", counting_read_table)
+    assert len(list(sweeps.generate_config_dicts(sweep))) == 9
+    # Read again for every config of the preceding statements.
+    assert n_reads == 3
+
+
+def test_cells_are_parsed_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("rows.csv", "w") as f:
+        f.write('a\n"@g(z=%m + 1)"\n"[1, %m]"\n')
+    tables.clear_cell_cache()
+    configs = list(e2e.parse_sweep("m: [1, 2, 3]\ntable a from 'rows.csv'"))
+    assert len(configs) == 6
+    info = tables.cell_cache_info()
+    assert (info.hits, info.misses) == (4, 2)
+
+
+@pytest.mark.parametrize(
+    "contents,message",
+    [
+        ("f.a,b\n1,2\n", "no column for c"),
+        ("f.a,b,c\n1,2\n", "inconsistent number of columns"),
+        ("f.a,b,c\n1,2,adam\n", "Invalid value 'adam'"),
+        ("", "Missing the header row"),
+    ],
+)
+def test_invalid_csv_tables(tmp_path, monkeypatch, contents, message):
+    monkeypatch.chdir(tmp_path)
+    with open("rows.csv", "w") as f:
+        f.write(contents)
+    with pytest.raises(ValueError, match=message):
+        list(e2e.parse_sweep(external_table("rows.csv")))
+
+
+def test_unsupported_table_file():
+    with pytest.raises(ValueError, match="Unsupported external table"):
+        list(e2e.parse_sweep("table a from 'rows.json'"))
+
+
+def test_table_paths_are_relative_to_the_sweep_file(tmp_path, monkeypatch):
+    sweep_dir = tmp_path / "sweeps"
+    sweep_dir.mkdir()
+    (sweep_dir / "rows.csv").write_text("a\n1\n2\n")
+    sweep_path = sweep_dir / "sweep.hyp"
+    sweep_path.write_text("table a from 'rows.csv'")
+    (tmp_path / "other.hyp").write_text("b = 3")
+    # The compiled sweep can be anywhere.
+    compiled_path = str(tmp_path / "sweep.hypc")
+    e2e.save_compiled_sweep_file(sweep_path, compiled_path)
+
+    monkeypatch.chdir(tmp_path)
+    assert list(e2e.parse_sweep_file(sweep_path)) == ["a = 1", "a = 2"]
+    assert list(e2e.parse_sweep_file(compiled_path)) == ["a = 1", "a = 2"]
+    assert list(
+        e2e.parse_sweep_files_and_bindings(["other.hyp", sweep_path], "c = 4")
+    ) == ["b = 3\na = 1\nc = 4", "b = 3\na = 2\nc = 4"]
@@ -303,6 +303,11 @@ def tables(draw, correct=True):
     return table
 
 
+@st.composite
+def wheres(draw):
+    return ast.Where(expr=draw(exprs()))
+
+
 def make_block_extend(block_type):
     @st.composite
     def blocks(draw, statement_st):
@@ -1,4 +1,5 @@
 import operator as operator_lib
+import re
 
 from hyperion import ast
 
@@ -66,20 +67,29 @@ def flatten_withs(tree):
     return fold(flatten_node, tree)
 
 
+# Operator names map to functions once, instead of on every evaluation. The
+# operators not in the operator module are defined by hand.
+unary_operator_functions = {
+    operator: getattr(operator_lib, operator) for operator in ast.unary_operators
+}
+binary_operator_functions = {
+    "land": lambda left, right: left and right,
+    "lor": lambda left, right: left or right,
+    "in_": lambda left, right: left in right,
+    "not_in": lambda left, right: left not in right,
+}
+binary_operator_functions.update(
+    (operator, getattr(operator_lib, operator))
+    for operator in ast.binary_operators - binary_operator_functions.keys()
+)
+
+
 def eval_unary_op(operator, operand):
-    return getattr(operator_lib, operator)(operand)
+    return unary_operator_functions[operator](operand)
 
 
 def eval_binary_op(left, operator, right):
-    if operator == "land":
-        return left and right
-    if operator == "lor":
-        return left or right
-    if operator == "in_":
-        return left in right
-    if operator == "not_in":
-        return left not in right
-    return getattr(operator_lib, operator)(left, right)
+    return binary_operator_functions[operator](left, right)
 
 
 def partial_eval(tree):
@@ -104,6 +114,35 @@ def partial_eval(tree):
     return fold(eval_node, tree)
 
 
+def evaluate(expr, resolve_macro, eval_reference=None):
+    # Evaluates an expression statically, with the same semantics as the runtime.
+    # Macros are resolved to expressions using resolve_macro. References and calls
+    # can't be evaluated without Gin, unless eval_reference maps their nodes to
+    # values. The arguments of calls are evaluated by then.
+    def eval_node(node):
+        if type(node) is ast.String:
+            return str(node)
+        if type(node) is ast.List:
+            return list(node.items)
+        if type(node) is ast.Tuple:
+            return node.items
+        if type(node) is ast.Dict:
+            return dict(node.items)
+        if type(node) is ast.UnaryOp:
+            return eval_unary_op(*node)
+        if type(node) is ast.BinaryOp:
+            return eval_binary_op(*node)
+        if type(node) is ast.Macro:
+            return evaluate(resolve_macro(node.name), resolve_macro, eval_reference)
+        if type(node) in (ast.Reference, ast.Call):
+            if eval_reference is None:
+                raise ValueError(f"Cannot evaluate a {type(node).__name__} statically.")
+            return eval_reference(node)
+        return node
+
+    return fold(eval_node, expr)
+
+
 def make_identifier(namespace_path, name):
     return ast.Identifier(
         scope=ast.Scope(path=()),
@@ -149,14 +188,14 @@ def append_name(name, identifier):
     )
 
 
-def calls_to_evaluated_references(config):
+def calls_to_evaluated_references(config, scope_prefix="_"):
     call_index = 0
     calls_with_args = []
 
     def convert_node(node):
         if type(node) is ast.Call and node.arguments:
             nonlocal call_index
-            scope = f"_{call_index}"
+            scope = f"{scope_prefix}{call_index}"
             call_index += 1
             new_identifier = append_scope(scope, node.identifier)
             call_with_args = node._replace(identifier=new_identifier)
@@ -174,6 +213,79 @@ def calls_to_evaluated_references(config):
     return config._replace(statements=(config.statements + extra_bindings))
 
 
+# Inverse of calls_to_evaluated_references and expressions_to_calls, for showing
+# preprocessed configs as written, e.g. @_0/g() with _0/g.y = 1 as @g(y=1).
+# Hoisted scopes are _N, or _t<hash>_N for the cells of external tables.
+
+hoisted_scope_pattern = re.compile(r"_(t[0-9a-f]+_)?[0-9]+\Z")
+
+hoisted_operators = {
+    make_identifier(("_h",), "_u"): lambda arguments: ast.UnaryOp(
+        operator=str(arguments["o"]), operand=arguments["v"]
+    ),
+    make_identifier(("_h",), "_b"): lambda arguments: ast.BinaryOp(
+        left=arguments["l"], operator=str(arguments["o"]), right=arguments["r"]
+    ),
+}
+
+
+def is_hoisted_argument(identifier):
+    return (
+        bool(identifier.scope.path)
+        and bool(identifier.namespace.path)
+        and hoisted_scope_pattern.match(identifier.scope.path[-1]) is not None
+    )
+
+
+def hoisted_arguments(bindings):
+    # Maps the identifiers of the hoisted calls to their arguments, given pairs
+    # (identifier, expr) of the bindings in order.
+    arguments = {}
+    for (identifier, expr) in bindings:
+        if not is_hoisted_argument(identifier):
+            continue
+        call_identifier = identifier._replace(
+            namespace=ast.Namespace(path=identifier.namespace.path[:-1]),
+            name=identifier.namespace.path[-1],
+        )
+        arguments.setdefault(call_identifier, []).append((identifier.name, expr))
+    return arguments
+
+
+def restore_hoisted_calls(expr, arguments):
+    def restore_node(node):
+        if type(node) is not ast.Call or node.arguments:
+            return node
+        call_arguments = arguments.get(node.identifier)
+        if call_arguments is None:
+            return node
+
+        call_arguments = tuple(
+            (name, restore_hoisted_calls(value, arguments))
+            for (name, value) in call_arguments
+        )
+        identifier = node.identifier._replace(
+            scope=ast.Scope(path=node.identifier.scope.path[:-1])
+        )
+        if not identifier.scope.path and identifier in hoisted_operators:
+            return hoisted_operators[identifier](dict(call_arguments))
+        return ast.Call(identifier=identifier, arguments=call_arguments)
+
+    return fold(restore_node, expr)
+
+
+def restore_hoisted_bindings(bindings):
+    # Returns the pairs (identifier, expr) of bindings without the hoisted
+    # arguments, which are put back into the calls.
+    bindings = list(bindings)
+    arguments = hoisted_arguments(bindings)
+    return [
+        (identifier, restore_hoisted_calls(expr, arguments))
+        for (identifier, expr) in bindings
+        if not is_hoisted_argument(identifier)
+    ]
+
+
 def preprocess_config(config, with_partial_eval=True):
     config = flatten_withs(config)
     if with_partial_eval:
@@ -209,6 +321,49 @@ def remove_prelude(sweep):
     return (sweep._replace(statements=statements), prelude)
 
 
+class Constraint:
+    # Compiled expression of a `where` statement. It's not an AST node, so fold
+    # treats it as a leaf and the expression is protected from the config
+    # transforms. decode maps the values in the config dicts back to expressions.
+
+    def __init__(self, expr, decode=None):
+        self.expr = expr
+        self.decode = decode
+
+        self.identifiers = set()
+
+        def collect_macro(node):
+            if type(node) is ast.Macro:
+                self.identifiers.add(make_identifier(namespace_path=(), name=node.name))
+            return node
+
+        fold(collect_macro, expr)
+
+    def with_decode(self, decode):
+        return Constraint(self.expr, decode)
+
+    def __call__(self, config_dict):
+        def resolve_macro(name):
+            identifier = make_identifier(namespace_path=(), name=name)
+            if identifier not in config_dict:
+                raise ValueError(f"Constraint references an unbound macro: %{name}.")
+            value = config_dict[identifier]
+            if self.decode is not None:
+                value = self.decode[value]
+            return value
+
+        return bool(evaluate(self.expr, resolve_macro))
+
+
+def compile_constraints(sweep):
+    def compile_node(node):
+        if type(node) is ast.Where:
+            return node._replace(expr=Constraint(partial_eval(node.expr)))
+        return node
+
+    return fold(compile_node, sweep)
+
+
 def bindings_to_singletons(sweep):
     def binding_to_singleton(binding):
         return ast.All(binding.identifier, (binding.expr,))
@@ -237,10 +392,20 @@ def bindings_to_singletons(sweep):
                 return node
 
             singletons = tuple(map(binding_to_singleton, bindings))
+            # Constraints should see the bindings, so they go to the product too.
+            wheres = tuple(
+                statement
+                for statement in node.statements
+                if type(statement) is ast.Where
+            )
             non_bindings = tuple(
-                statement for statement in node.statements if statement not in bindings
+                statement
+                for statement in node.statements
+                if statement not in bindings and statement not in wheres
+            )
+            return ast.Product(
+                statements=(singletons + (ast.Union(non_bindings),) + wheres)
             )
-            return ast.Product(statements=(singletons + (ast.Union(non_bindings),)))
 
         return node
 
@@ -249,5 +414,7 @@ def bindings_to_singletons(sweep):
 
 def preprocess_sweep(sweep, with_partial_eval=True):
     validate_sweep(sweep)
+    # Before preprocess_config, which would convert the expressions to calls.
+    sweep = compile_constraints(sweep)
     sweep = preprocess_config(sweep, with_partial_eval)
     return bindings_to_singletons(sweep)
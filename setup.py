@@ -9,7 +9,8 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=[
-        "gin-config",
+        # The registry relies on Gin internals.
+        "gin-config>=0.5.0,<0.6",
         "lark",
     ],
     extras_require={
@@ -19,6 +20,9 @@ setup(
             "pytest",
             "pytest-cov",
         ],
+        "numpy": [
+            "numpy",
+        ],
     },
     scripts=[
         "scripts/hyperion",